@@ -1,9 +1,11 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import math, time
+from headless import window_type
+from benchmark import bench_requested, run_bench
 
 # Initialize the Ursina app and window
-app = Ursina()
+app = Ursina(window_type=window_type())
 window.title = "Ursina Mario-style Game"
 window.borderless = False  # Windowed mode for easier compatibility
 
@@ -235,8 +237,11 @@ def update():
             # Trigger win state
             game_over("You got the Star!")
 
-# Start the app
-app.run()
+# Start the app (or hand it to the benchmark runner)
+if bench_requested():
+    run_bench(app, start=start_game)
+else:
+    app.run()
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import math, time
@@ -3,8 +3,13 @@ from ursina.shaders import basic_lighting_shader
 from ursina.prefabs.first_person_controller import FirstPersonController
 import sys
 import platform
+import math
+from headless import window_type
+from benchmark import bench_requested, population, run_bench
+from staticbatch import StaticBatch
+from collisionproxy import use_proxy_collider
 
-app = Ursina()
+app = Ursina(window_type=window_type())
 
 # Windows-specific patch: Display a message if running on Windows NT
 if platform.system() == "Windows":
@@ -21,7 +26,7 @@ scene.fog_color = color.rgb(135, 206, 235)
 scene.fog_density = 0.01
 scene.ambient_color = color.light_gray
 
-def create_peachs_castle():
+def create_peachs_castle(batch):
     # Main Castle Structure
     castle = Entity(
         model='cube', 
@@ -39,9 +44,9 @@ def create_peachs_castle():
         scale=(5, 30, 5),
         texture='brick',
         color=color.rgb(255, 220, 220),
-        position=(0, 15, 0),
-        collider='mesh'
+        position=(0, 15, 0)
     )
+    use_proxy_collider(tower)   # no cheap exact shape for cylinders, stays a mesh
     
     # Courtyard
     courtyard = Entity(
@@ -72,6 +77,7 @@ def create_peachs_castle():
                 position=(x, y, 7.4),
                 rotation=(0, 180, 0)
             )
+            batch.add(win)
     
     # Castle Roof
     roof = Entity(
@@ -82,22 +88,30 @@ def create_peachs_castle():
         rotation=(0, 0, 0)
     )
 
-def create_trees():
-    # Basic Trees
-    for x in [-20, 20]:
-        for z in [-20, 20]:
-            trunk = Entity(
-                model='cylinder',
-                scale=(1, 5, 1),
-                color=color.brown,
-                position=(x, 2.5, z)
-            )
-            leaves = Entity(
-                model='sphere',
-                scale=(3, 4, 3),
-                color=color.green,
-                position=(x, 5, z)
-            )
+    for part in (castle, tower, courtyard, door, roof):
+        batch.add(part)
+
+def create_trees(batch):
+    # Basic Trees, laid out on a square grid between the corners at +/-20
+    count = population('trees', 4)
+    side = max(1, math.ceil(math.sqrt(count)))
+    for i in range(count):
+        x = -20 + 40 * (i % side) / max(side - 1, 1)
+        z = -20 + 40 * (i // side) / max(side - 1, 1)
+        trunk = Entity(
+            model='cylinder',
+            scale=(1, 5, 1),
+            color=color.brown,
+            position=(x, 2.5, z)
+        )
+        leaves = Entity(
+            model='sphere',
+            scale=(3, 4, 3),
+            color=color.green,
+            position=(x, 5, z)
+        )
+        batch.add(trunk)
+        batch.add(leaves)
 
 # Player Controller
 class CastleVisitor(FirstPersonController):
@@ -110,9 +124,11 @@ class CastleVisitor(FirstPersonController):
         )
         self.mouse_sensitivity = Vec2(100, 100)
 
-# Build Environment
-create_peachs_castle()
-create_trees()
+# Build Environment (all static, merged into a few meshes per texture)
+level_batch = StaticBatch('castle_grounds')
+create_peachs_castle(level_batch)
+create_trees(level_batch)
+level_batch.build()
 player = CastleVisitor()
 
 # Lighting
@@ -129,4 +145,7 @@ def update():
         exit_game()
 
 if __name__ == '__main__':
-    app.run()
+    if bench_requested():
+        run_bench(app)
+    else:
+        app.run()
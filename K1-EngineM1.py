@@ -10,10 +10,23 @@ Note for M1 Mac users:
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import math, time, random
-
-app = Ursina()
+from headless import headless_requested, run_headless, sim_time, window_type
+from benchmark import bench_requested, population, report_start_time, run_bench
+from spatialhash import SpatialHash
+from hazardsystem import HazardSystem
+from levelcache import load_level
+from collisionproxy import use_proxy_collider
+from entitypool import EntityPools
+from updatetiers import UpdateTiers
+from profiler import Profiler
+from telemetry import Telemetry, telemetry_path
+from replay import ReplaySession
+
+app = Ursina(window_type=window_type())
 window.title = "Mini Bob-omb Battlefield"
 window.borderless = False
+# Per-system frame timings; F9 (or a frame over 50 ms) writes a Chrome trace to profiles/
+profiler = Profiler(budget_ms=50).install(app)
 
 # -------------------------------------------------------------------
 # GLOBAL VARIABLES
@@ -29,13 +42,34 @@ hazards = []
 boss = None
 star_entity = None
 
+# Broadphase grid that hazards, the boss and the star register into
+collision_grid = SpatialHash(cell_size=4)
+PLAYER_RADIUS = 0.7
+
+# F3 shows frame timings over the game; --telemetry [file] also streams them to JSONL
+telemetry = Telemetry(app, profiler, counters={'collision_queries': lambda: collision_grid.queries},
+                      path=telemetry_path())
+
+# Hazard motion is simulated in batches, one per hazard kind
+hazard_system = HazardSystem(grid=collision_grid)
+# Boulders roll down the hill and go back to the top once they pass z = -10
+hazard_system.add_kind('boulder', respawn_low=(-2, 7, 24), respawn_high=(2, 7, 26), bounds_low=(-math.inf, -math.inf, -10))
+hazard_system.add_kind('chain_chomp')
+
+def reseed(seed):
+    random.seed(seed)
+    hazard_system.seed(seed)
+
+# --record FILE saves this session's input and random seed, --replay FILE plays it back
+replay = ReplaySession(app, reseed)
+
 # HUD
 health_text = None
 score_text = None
 
 # Invulnerability
-last_hit_time = 0
 INVULN_DURATION = 1.0
+last_hit_time = -INVULN_DURATION  # sim_time() starts near 0, so 0 would mean "just hit"
 
 # -------------------------------------------------------------------
 # UI SETUP
@@ -53,12 +87,72 @@ menu_button = Button(text="Main Menu", parent=pause_menu, color=color.orange, sc
 for ui_element in pause_menu.children:
     ui_element.ignore_paused = True
 
+# -------------------------------------------------------------------
+# ENTITY POOLS
+# -------------------------------------------------------------------
+# Everything a round spawns is taken from here and handed back on cleanup,
+# so the next round reuses the same nodes instead of building new ones.
+pools = EntityPools()
+# The star spins at full rate up close, less often far away, not at all out of range
+update_tiers = UpdateTiers()
+update_tiers.register('star', near=30, far=90, every=3,
+                      models={'near': 'sphere', 'mid': 'icosphere', 'far': 'icosphere'})
+
+def build_player():
+    player = FirstPersonController(
+        model='cube',
+        scale=(1,1.7,1),
+        origin_y=-0.5,
+        collider='box',
+        speed=6
+    )
+    player.gravity = 1
+    player.cursor.visible = False
+    return player
+
+def reset_player(player):
+    player.rotation = Vec3(0,0,0)
+    player.camera_pivot.rotation = Vec3(0,0,0)
+    player.color = color.white
+    player.grounded = False
+    player.jumping = False
+    player.air_time = 0
+    # The controller's own ground snap ran where it was built; redo it at the spawn point acquire() set
+    if player.gravity:
+        ray = raycast(player.world_position + (0, player.height, 0), player.down,
+                      traverse_target=player.traverse_target, ignore=player.ignore_list)
+        if ray.hit:
+            player.y = ray.world_point.y
+
+def build_star():
+    star = Entity(model='sphere', color=color.yellow, scale=1)
+    def star_spin(dt):
+        star.rotation_y += 90 * dt
+        star.y = star.base_y + math.sin(sim_time()*4)*0.5
+    star.tick = star_spin
+    return update_tiers.add(star, 'star')
+
+pools.register('player', build_player, reset_player)
+pools.register('sky', Sky)
+pools.register('boulder', lambda: Entity(model='sphere', color=color.gray, collider='sphere', scale=1.5),
+               reserve=population('boulders', 3))
+pools.register('chain_chomp', lambda: Entity(model='sphere', color=color.black, collider='sphere', scale=2, name="Chain Chomp"))
+pools.register('boss', lambda: Entity(model='sphere', collider='sphere', scale=2, name="Big Bob-omb"))
+pools.register('star', build_star, reserve=1)
+pools.register('confetti', lambda: Entity(model='quad', texture='white_cube', scale=10), reserve=1)
+pools.register('hud_text', lambda: Text('', parent=camera.ui, scale=1.5), reserve=2)
+pools.register('banner', lambda: Text('', parent=camera.ui, origin=(0,0), scale=2), reserve=1)
+
 # -------------------------------------------------------------------
 # FUNCTIONS
 # -------------------------------------------------------------------
+@replay.round_start
 def start_game():
     global game_running, player, health, score, health_text, score_text
-    global game_entities, hazards, boss, star_entity
+    global game_entities, hazards, boss, star_entity, last_hit_time
+    report_start_time()
+    profiler.expect_hitch()  # building the round is slow on purpose; don't dump a trace for it
+    last_hit_time = -INVULN_DURATION
 
     menu_ui.enabled = False
     game_running = True
@@ -70,107 +164,89 @@ def start_game():
         destroy(ent)
     game_entities.clear()
     hazards.clear()
-    if boss: destroy(boss)
-    if star_entity: destroy(star_entity)
+    hazard_system.clear()
+    collision_grid.clear()
+    pools.release_all()
     boss = None
     star_entity = None
 
     create_level_geometry()
-    Sky()
+    pools.acquire('sky')
 
-    player = FirstPersonController(
-        model='cube',
-        scale=(1,1.7,1),
-        origin_y=-0.5,
-        collider='box',
-        speed=6,
-        position=spawn_point
-    )
-    player.gravity = 1
-    player.cursor.visible = False
-    game_entities.append(player)
+    player = pools.acquire('player', position=spawn_point)
 
     spawn_boulders()
     spawn_chain_chomp()
 
-    boss = Entity(
-        model='sphere',
-        color=color.magenta,
-        collider='sphere',
-        scale=2,
-        position=(0, 6.5, 25),
-        name="Big Bob-omb"
-    )
-    game_entities.append(boss)
+    boss = pools.acquire('boss', color=color.magenta, position=(0, 6.5, 25), rotation=(0, 0, 0), hp=3)
+    collision_grid.insert(boss, boss.position, 3, tag='boss')
 
     # Initialize HUD
-    if health_text: destroy(health_text)
-    if score_text: destroy(score_text)
-    health_text = Text(f"Health: {health}", parent=camera.ui, origin=(-0.5, 0.5), scale=1.5, position=(-0.4, 0.45))
-    score_text = Text(f"Stars: {score}", parent=camera.ui, origin=(0.5, 0.5), scale=1.5, position=(0.4, 0.45))
+    health_text = pools.acquire('hud_text', text=f"Health: {health}", origin=(-0.5, 0.5), position=(-0.4, 0.45))
+    score_text = pools.acquire('hud_text', text=f"Stars: {score}", origin=(0.5, 0.5), position=(0.4, 0.45))
 
     application.paused = False
     pause_menu.enabled = False
     mouse.locked = True
 
-def create_level_geometry():
+def build_level_geometry(batch, fence_posts):
     ground = Entity(
         model='plane',
         texture='grass',
         texture_scale=(50,50),
-        collider='mesh',
         scale=(50,1,50),
         color=color.lime.tint(-.25),
-        position=(0,0,0)
+        position=(0,0,0),
+        name='ground'
     )
-    game_entities.append(ground)
+    use_proxy_collider(ground)
+    batch.add(ground)
 
     for i in range(1,6):
         step = Entity(
             model='plane',
-            collider='mesh',
             texture='grass',
             texture_scale=(8,8),
             scale=(8,1,8),
             position=(0,i*1.2,i*5),
-            color=color.lime.tint(-.25 + i*0.03)
+            color=color.lime.tint(-.25 + i*0.03),
+            name=f'step{i}'
         )
-        game_entities.append(step)
+        use_proxy_collider(step)
+        batch.add(step)
 
-    for x in range(-25,26,5):
+    for i in range(fence_posts):
+        x = -25 + 50 * i / max(fence_posts - 1, 1)
         fence_post = Entity(
             model='cube',
             collider='box',
             scale=(0.5,3,0.5),
             color=color.brown,
-            position=(x,1,-25)
+            position=(x,1,-25),
+            name=f'fence_post{i}'
         )
-        game_entities.append(fence_post)
+        batch.add(fence_post)
+
+def create_level_geometry():
+    # Static, so it is merged and cached on disk; only rebuilt when the builder changes
+    level = load_level('k1_level', build_level_geometry, fence_posts=population('fence_posts', 11))
+    game_entities.append(level.root)
 
 def spawn_boulders():
-    for i in range(3):
-        boulder = Entity(
-            model='sphere',
-            color=color.gray,
-            collider='sphere',
-            scale=1.5,
+    for i in range(population('boulders', 3)):
+        boulder = pools.acquire(
+            'boulder',
             position=(random.uniform(-2,2), 7, 25+random.uniform(-1,1)),
+            rotation=(0,0,0),
             name=f"Boulder{i}"
         )
         hazards.append(boulder)
-        game_entities.append(boulder)
+        hazard_system.add('boulder', boulder, boulder.scale_x/2, velocity=(0, 0, -4), spin=(180, 0, 0))
 
 def spawn_chain_chomp():
-    chomp = Entity(
-        model='sphere',
-        color=color.black,
-        collider='sphere',
-        scale=2,
-        position=(-10,1,5),
-        name="Chain Chomp"
-    )
+    chomp = pools.acquire('chain_chomp', position=(-10,1,5), rotation=(0,0,0))
     hazards.append(chomp)
-    game_entities.append(chomp)
+    hazard_system.add('chain_chomp', chomp, chomp.scale_x/2, spin=(0, 120, 0), sway=(3, 0, 0))
 
 def cleanup_game():
     global player, health_text, score_text, game_entities, hazards, boss, star_entity
@@ -178,17 +254,14 @@ def cleanup_game():
         destroy(ent)
     game_entities.clear()
     hazards.clear()
-    if boss: destroy(boss)
-    if star_entity: destroy(star_entity)
-    if health_text: destroy(health_text)
-    if score_text: destroy(score_text)
+    hazard_system.clear()
+    collision_grid.clear()
+    pools.release_all()
     boss = None
     star_entity = None
     health_text = None
     score_text = None
-    if player:
-        destroy(player)
-        player = None
+    player = None
 
 def game_over(message="Game Over"):
     global game_running
@@ -196,9 +269,9 @@ def game_over(message="Game Over"):
     application.paused = False
     mouse.locked = False
     end_color = color.red if "Over" in message else color.yellow
-    end_text = Text(message, parent=camera.ui, origin=(0,0), scale=2, color=end_color)
+    end_text = pools.acquire('banner', text=message, color=end_color)
     invoke(go_to_menu, delay=2)
-    invoke(destroy, end_text, delay=2)
+    pools.release_after(end_text, 2)
 
 def go_to_menu():
     cleanup_game()
@@ -239,6 +312,7 @@ pause_handler.input = pause_handler_input
 # -------------------------------------------------------------------
 # UPDATE LOOP
 # -------------------------------------------------------------------
+@profiler.profiled
 def update():
     global health, score, last_hit_time, star_entity
 
@@ -253,20 +327,23 @@ def update():
         respawn_player()
 
     animate_hazards()
+    with profiler.scope('update_tiers'):
+        update_tiers.update(time.dt)
     handle_boss_encounter()
     check_collisions()
 
     if star_entity and player and star_entity.enabled:
-        if distance(player, star_entity) < 1:
+        if star_entity in collision_grid.query(player.position, tag='star') and distance(player, star_entity) < 1:
             score += 1
             score_text.text = f"Stars: {score}"
-            destroy(star_entity)
+            collision_grid.remove(star_entity)
+            pools.release(star_entity)
             star_entity = None
             game_over("You got the Star!")
 
 def damage_player(amount):
     global health, last_hit_time
-    current_time = time.time()
+    current_time = sim_time()
     if current_time - last_hit_time < INVULN_DURATION:
         return
     health -= amount
@@ -280,24 +357,18 @@ def respawn_player():
         player.position = spawn_point
         player.rotation = Vec3(0,0,0)
 
+@profiler.profiled
 def animate_hazards():
-    for hazard in hazards[:]:  # Use copy to avoid modification during iteration
-        if not hazard.enabled:
-            continue
-        if "Boulder" in hazard.name:
-            hazard.z -= 4 * time.dt
-            hazard.rotation_x += 180 * time.dt
-            if hazard.z < -10:
-                hazard.position = (random.uniform(-2,2), 7, 25+random.uniform(-1,1))
-        elif hazard.name == "Chain Chomp":
-            hazard.rotation_y += 120 * time.dt
-            hazard.x = -10 + math.sin(time.time()) * 3
+    """Move the boulders, chain chomp, etc. in one batched step."""
+    hazard_system.step(time.dt, sim_time())
 
+@profiler.profiled
 def check_collisions():
     if not player or not player.enabled:
         return
-    current_time = time.time()
-    for hazard in hazards[:]:
+    current_time = sim_time()
+    # Only hazards sharing a grid cell with the player can be close enough
+    for hazard in collision_grid.query(player.position, PLAYER_RADIUS, tag='hazard'):
         if not hazard.enabled:
             continue
         if distance(player, hazard) < (hazard.scale_x/2 + 0.7):
@@ -306,53 +377,56 @@ def check_collisions():
                 game_over("Game Over")
                 return
 
+@profiler.profiled
 def handle_boss_encounter():
     global boss, star_entity
     if not boss or not boss.enabled or not player:
         return
 
-    dist_to_boss = distance(player, boss)
+    near_boss = boss in collision_grid.query(player.position, tag='boss')
     if not hasattr(boss, 'hp'):
         boss.hp = 3
 
     boss.rotation_y += 40 * time.dt
 
-    if dist_to_boss < 3 and boss.hp > 0:
+    if near_boss and distance(player, boss) < 3 and boss.hp > 0:
         boss.hp -= 1
         boss.blink(color.red)
         knockback = (player.position - boss.position).normalized() * 2
         player.position += knockback
         if boss.hp <= 0:
             spawn_star_at(boss.position + Vec3(0, 3, 0))
-            destroy(boss)
+            collision_grid.remove(boss)
+            pools.release(boss)
             boss = None
-            confetti = Entity(
-                model='quad',
-                texture='white_cube',
+            confetti = pools.acquire(
+                'confetti',
                 color=color.random_color(),
-                position=boss.position if boss else Vec3(0, 6.5, 25),
-                scale=10
+                position=boss.position if boss else Vec3(0, 6.5, 25)
             )
-            destroy(confetti, delay=1)
+            pools.release_after(confetti, 1)
 
 def spawn_star_at(position):
     global star_entity
     if star_entity:
-        destroy(star_entity)
-    star_entity = Entity(
-        model='sphere',
-        color=color.yellow,
-        scale=1,
-        position=position
-    )
-    def star_spin():
-        if star_entity and star_entity.enabled:
-            star_entity.rotation_y += 90 * time.dt
-            star_entity.y = position.y + math.sin(time.time()*4)*0.5
-    star_entity.update = star_spin
-    game_entities.append(star_entity)
+        collision_grid.remove(star_entity)
+        pools.release(star_entity)
+    star_entity = pools.acquire('star', position=position, base_y=position.y)
+    collision_grid.insert(star_entity, position, 1, tag='star')
 
 # -------------------------------------------------------------------
 # RUN
 # -------------------------------------------------------------------
-app.run()
\ No newline at end of file
+def start_if_in_menu():
+    """Headless runs skip the menu and go straight into a new round."""
+    if menu_ui.enabled:
+        start_game()
+
+if headless_requested():
+    run_headless(app, before_tick=start_if_in_menu)
+elif bench_requested():
+    run_bench(app, start=start_game, sample=lambda: update_tiers.counts)
+elif replay.replaying:
+    replay.run(start_game)
+else:
+    app.run()
\ No newline at end of file
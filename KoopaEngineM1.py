@@ -10,10 +10,23 @@ Note for M1 Mac users:
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import math, time, random
-
-app = Ursina()
+from headless import headless_requested, run_headless, sim_time, window_type
+from benchmark import bench_requested, population, report_start_time, run_bench
+from spatialhash import SpatialHash
+from hazardsystem import HazardSystem
+from levelcache import load_level
+from collisionproxy import use_proxy_collider
+from entitypool import EntityPools
+from updatetiers import UpdateTiers
+from profiler import Profiler
+from telemetry import Telemetry, telemetry_path
+from replay import ReplaySession
+
+app = Ursina(window_type=window_type())
 window.title = "Mini Bob-omb Battlefield"
 window.borderless = False
+# Per-system frame timings; F9 (or a frame over 50 ms) writes a Chrome trace to profiles/
+profiler = Profiler(budget_ms=50).install(app)
 
 # -------------------------------------------------------------------
 # GLOBAL VARIABLES
@@ -29,13 +42,34 @@ hazards = []
 boss = None
 star_entity = None
 
+# Broadphase grid that hazards, the boss and the star register into
+collision_grid = SpatialHash(cell_size=4)
+PLAYER_RADIUS = 0.7
+
+# F3 shows frame timings over the game; --telemetry [file] also streams them to JSONL
+telemetry = Telemetry(app, profiler, counters={'collision_queries': lambda: collision_grid.queries},
+                      path=telemetry_path())
+
+# Hazard motion is simulated in batches, one per hazard kind
+hazard_system = HazardSystem(grid=collision_grid)
+# Boulders roll down the hill and go back to the top once they pass z = -10
+hazard_system.add_kind('boulder', respawn_low=(-2, 7, 24), respawn_high=(2, 7, 26), bounds_low=(-math.inf, -math.inf, -10))
+hazard_system.add_kind('chain_chomp')
+
+def reseed(seed):
+    random.seed(seed)
+    hazard_system.seed(seed)
+
+# --record FILE saves this session's input and random seed, --replay FILE plays it back
+replay = ReplaySession(app, reseed)
+
 # HUD
 health_text = None
 score_text = None
 
 # Invulnerability after taking damage
-last_hit_time = 0
 INVULN_DURATION = 1.0
+last_hit_time = -INVULN_DURATION  # sim_time() starts near 0, so 0 would mean "just hit"
 
 # -------------------------------------------------------------------
 # UI SETUP
@@ -77,13 +111,75 @@ menu_button = Button(
 for ui_element in pause_menu.children:
     ui_element.ignore_paused = True
 
+# -------------------------------------------------------------------
+# ENTITY POOLS
+# -------------------------------------------------------------------
+# Everything a round spawns is taken from here and handed back on cleanup,
+# so the next round reuses the same nodes instead of building new ones.
+pools = EntityPools()
+# The star spins at full rate up close, less often far away, not at all out of range
+update_tiers = UpdateTiers()
+update_tiers.register('star', near=30, far=90, every=3,
+                      models={'near': 'sphere', 'mid': 'icosphere', 'far': 'icosphere'})
+
+def build_player():
+    player = FirstPersonController(
+        model='cube',
+        scale=(1,1.7,1),  # a bit taller to look more “character-like”
+        origin_y=-0.5,
+        collider='box',
+        speed=6
+    )
+    player.gravity = 1
+    player.cursor.visible = False  # hide crosshair
+    return player
+
+def reset_player(player):
+    """Forget the last round's look direction, jump and damage blink; stand on the ground at the spawn point."""
+    player.rotation = Vec3(0,0,0)
+    player.camera_pivot.rotation = Vec3(0,0,0)
+    player.color = color.white
+    player.grounded = False
+    player.jumping = False
+    player.air_time = 0
+    # The controller's own ground snap ran where it was built; redo it at the spawn point acquire() set
+    if player.gravity:
+        ray = raycast(player.world_position + (0, player.height, 0), player.down,
+                      traverse_target=player.traverse_target, ignore=player.ignore_list)
+        if ray.hit:
+            player.y = ray.world_point.y
+
+def build_star():
+    star = Entity(model='sphere', color=color.yellow, scale=1)
+    # rotate it and bob it around the height it was dropped at
+    def star_spin(dt):
+        star.rotation_y += 90 * dt
+        star.y = star.base_y + math.sin(sim_time()*4)*0.5
+    star.tick = star_spin
+    return update_tiers.add(star, 'star')
+
+pools.register('player', build_player, reset_player)
+pools.register('sky', Sky)
+pools.register('boulder', lambda: Entity(model='sphere', color=color.gray, collider='sphere', scale=1.5),
+               reserve=population('boulders', 3))
+pools.register('chain_chomp', lambda: Entity(model='sphere', color=color.black, collider='sphere', scale=2, name="Chain Chomp"))
+pools.register('boss', lambda: Entity(model='sphere', collider='sphere', scale=2, name="Big Bob-omb"))
+pools.register('star', build_star, reserve=1)
+pools.register('confetti', lambda: Entity(model='quad', texture='white_cube', scale=10), reserve=1)
+pools.register('hud_text', lambda: Text('', parent=camera.ui, scale=1.5), reserve=2)
+pools.register('banner', lambda: Text('', parent=camera.ui, origin=(0,0), scale=2), reserve=1)
+
 # -------------------------------------------------------------------
 # FUNCTIONS
 # -------------------------------------------------------------------
+@replay.round_start
 def start_game():
     """Initialize the level, player, hazards, and HUD."""
     global game_running, player, health, score, health_text, score_text
-    global game_entities, hazards, boss, star_entity
+    global game_entities, hazards, boss, star_entity, last_hit_time
+    report_start_time()
+    profiler.expect_hitch()  # building the round is slow on purpose; don't dump a trace for it
+    last_hit_time = -INVULN_DURATION
 
     # Hide the main menu
     menu_ui.enabled = False
@@ -94,6 +190,8 @@ def start_game():
     score = 0
     hazards.clear()
     game_entities.clear()
+    hazard_system.clear()
+    collision_grid.clear()
     boss = None
     star_entity = None
 
@@ -101,49 +199,36 @@ def start_game():
     create_level_geometry()
 
     # Add a sky
-    Sky()
+    pools.acquire('sky')
 
     # Create the player
-    player = FirstPersonController(
-        model='cube',
-        scale=(1,1.7,1),  # a bit taller to look more “character-like”
-        origin_y=-0.5,
-        collider='box',
-        speed=6
-    )
-    player.position = spawn_point
-    player.gravity = 1
-    player.cursor.visible = False  # hide crosshair
-    game_entities.append(player)
+    player = pools.acquire('player', position=spawn_point)
 
     # Create hazards (rolling balls, chain chomp)
     spawn_boulders()
     spawn_chain_chomp()
 
     # Create the “Big Bob-omb” boss at the top
-    boss = Entity(
-        model='sphere',
+    boss = pools.acquire(
+        'boss',
         color=color.magenta,
-        collider='sphere',
-        scale=2,
         position=(0, 6.5, 25),  # near top of the hill
-        name="Big Bob-omb"
+        rotation=(0, 0, 0),
+        hp=3
     )
-    game_entities.append(boss)
+    collision_grid.insert(boss, boss.position, 3, tag='boss')
 
     # HUD
-    health_text = Text(
-        f"Health: {health}",
-        parent=camera.ui,
+    health_text = pools.acquire(
+        'hud_text',
+        text=f"Health: {health}",
         origin=(-0.5, 0.5),
-        scale=1.5,
         position=(-0.4, 0.45)
     )
-    score_text = Text(
-        f"Stars: {score}",
-        parent=camera.ui,
+    score_text = pools.acquire(
+        'hud_text',
+        text=f"Stars: {score}",
         origin=(0.5, 0.5),
-        scale=1.5,
         position=(0.4, 0.45)
     )
 
@@ -152,88 +237,89 @@ def start_game():
     mouse.locked = True
     print("Game started.")
 
-def create_level_geometry():
+def build_level_geometry(batch, fence_posts):
     """Create a basic 'hill' layout reminiscent of Bob-omb Battlefield."""
     # Large ground
     ground = Entity(
         model='plane',
         texture='grass',
         texture_scale=(50,50),
-        collider='mesh',
         scale=(50,1,50),
         color=color.lime.tint(-.25),
-        position=(0,0,0)
+        position=(0,0,0),
+        name='ground'
     )
-    game_entities.append(ground)
+    use_proxy_collider(ground)
+    batch.add(ground)
 
     # Create a gentle hill toward the “top area”
     # We'll do a simple layered approach to mimic a slope
     for i in range(1,6):
         step = Entity(
             model='plane',
-            collider='mesh',
             texture='grass',
             texture_scale=(8,8),
             scale=(8,1,8),
             rotation=(90,0,0),
             position=(0,i*1.2,i*5),
-            color=color.lime.tint(-.25 + i*0.03)
+            color=color.lime.tint(-.25 + i*0.03),
+            name=f'step{i}'
         )
-        game_entities.append(step)
+        use_proxy_collider(step)
+        batch.add(step)
 
     # Quick fence or barrier
     # (Just some boxes placed in a row at one side for “level boundary.”)
-    for x in range(-25,26,5):
+    for i in range(fence_posts):
+        x = -25 + 50 * i / max(fence_posts - 1, 1)
         fence_post = Entity(
             model='cube',
             collider='box',
             scale=(0.5,3,0.5),
             color=color.brown,
-            position=(x,1,-25)
+            position=(x,1,-25),
+            name=f'fence_post{i}'
         )
-        game_entities.append(fence_post)
+        batch.add(fence_post)
+
+def create_level_geometry():
+    """Load the static level, building it (and caching it on disk) only when it changed."""
+    level = load_level('bob_level', build_level_geometry, fence_posts=population('fence_posts', 11))
+    game_entities.append(level.root)
 
 def spawn_boulders():
     """Spawn rolling boulders that come down the hill."""
     # Let’s place a few boulders at the top that roll down
-    for i in range(3):
-        boulder = Entity(
-            model='sphere',
-            color=color.gray,
-            collider='sphere',
-            scale=1.5,
+    for i in range(population('boulders', 3)):
+        boulder = pools.acquire(
+            'boulder',
             position=(random.uniform(-2,2), 7, 25+random.uniform(-1,1)),
+            rotation=(0,0,0),
             name=f"Boulder{i}"
         )
         hazards.append(boulder)
-        game_entities.append(boulder)
+        hazard_system.add('boulder', boulder, boulder.scale_x, velocity=(0, 0, -4), spin=(180, 0, 0))
 
 def spawn_chain_chomp():
     """Spawn a Chain-Chomp-like hazard near the front area."""
-    chomp = Entity(
-        model='sphere',
-        color=color.black,
-        collider='sphere',
-        scale=2,
-        position=(-10,1,5),
-        name="Chain Chomp"
-    )
+    chomp = pools.acquire('chain_chomp', position=(-10,1,5), rotation=(0,0,0))
     hazards.append(chomp)
-    game_entities.append(chomp)
+    hazard_system.add('chain_chomp', chomp, chomp.scale_x, spin=(0, 120, 0), sway=(1.8, 0, 0))
 
 def cleanup_game():
-    """Destroy all game entities and UI."""
+    """Destroy the level and hand everything else back to the pools."""
     global player, health_text, score_text, game_entities, hazards, boss, star_entity
     for ent in game_entities:
         destroy(ent)
     game_entities.clear()
     hazards.clear()
+    hazard_system.clear()
+    collision_grid.clear()
+    pools.release_all()
     boss = None
     star_entity = None
-
-    if health_text: destroy(health_text)
-    if score_text: destroy(score_text)
-
+    health_text = None
+    score_text = None
     player = None
 
 def game_over(message="Game Over"):
@@ -244,11 +330,11 @@ def game_over(message="Game Over"):
     mouse.locked = False
 
     end_color = color.red if "Over" in message else color.yellow
-    end_text = Text(message, parent=camera.ui, origin=(0,0), scale=2, color=end_color)
+    end_text = pools.acquire('banner', text=message, color=end_color)
 
     print(message)
     invoke(go_to_menu, delay=2)
-    invoke(destroy, end_text, delay=2)
+    pools.release_after(end_text, 2)
 
 def go_to_menu():
     cleanup_game()
@@ -296,6 +382,7 @@ pause_handler.input = pause_handler_input
 # -------------------------------------------------------------------
 # UPDATE LOOP
 # -------------------------------------------------------------------
+@profiler.profiled
 def update():
     global health, score, last_hit_time, star_entity
 
@@ -311,16 +398,19 @@ def update():
         respawn_player()
 
     animate_hazards()
+    with profiler.scope('update_tiers'):
+        update_tiers.update(time.dt)
     handle_boss_encounter()
     check_collisions()
 
     # Check if star is collected
-    if star_entity and player and distance(player, star_entity) < 1:
+    if star_entity and player and star_entity in collision_grid.query(player.position, tag='star') \
+            and distance(player, star_entity) < 1:
         score += 1
         if score_text:
             score_text.text = f"Stars: {score}"
-        destroy(star_entity)
-        star_entity.disable()
+        collision_grid.remove(star_entity)
+        pools.release(star_entity)
         star_entity = None
         print("Star collected!")
         game_over("You got the Star!")
@@ -328,7 +418,7 @@ def update():
 def damage_player(amount):
     """Reduce health, apply blink effect, handle death."""
     global health, last_hit_time
-    current_time = time.time()
+    current_time = sim_time()
 
     if current_time - last_hit_time < INVULN_DURATION:
         return  # still invulnerable
@@ -346,27 +436,19 @@ def respawn_player():
         player.position = spawn_point
         player.rotation = Vec3(0,0,0)
 
+@profiler.profiled
 def animate_hazards():
-    """Move the boulders, chain chomp, etc."""
-    for hazard in hazards:
-        if "Boulder" in hazard.name:
-            # Roll it downward
-            hazard.z -= 4 * time.dt
-            hazard.rotation_x += 180 * time.dt
-            # If it gets to the bottom, send it back to top
-            if hazard.z < -10:
-                hazard.position = (random.uniform(-2,2), 7, 25+random.uniform(-1,1))
-        elif hazard.name == "Chain Chomp":
-            # Simple oscillation or random roam
-            hazard.rotation_y += 120 * time.dt
-            hazard.x += math.sin(time.time()) * 0.03
+    """Move the boulders, chain chomp, etc. in one batched step."""
+    hazard_system.step(time.dt, sim_time())
 
+@profiler.profiled
 def check_collisions():
     """Check collision between player and hazards."""
     if not player:
         return
-    current_time = time.time()
-    for hazard in hazards:
+    current_time = sim_time()
+    # Only hazards sharing a grid cell with the player can be close enough
+    for hazard in collision_grid.query(player.position, PLAYER_RADIUS, tag='hazard'):
         if hazard.collider:
             dist = distance(player.position, hazard.position)
             # approximate collision based on bounding sphere radii
@@ -376,6 +458,7 @@ def check_collisions():
                     game_over("Game Over")
                     return
 
+@profiler.profiled
 def handle_boss_encounter():
     """If player is near 'Big Bob-omb', trigger boss logic."""
     global boss, star_entity
@@ -383,7 +466,7 @@ def handle_boss_encounter():
     if not boss or not boss.enabled or not player:
         return
 
-    dist_to_boss = distance(player.position, boss.position)
+    near_boss = boss in collision_grid.query(player.position, tag='boss')
 
     # Simple logic: if close enough, "toss boss" or reduce boss HP, eventually drop a star
     # We'll store HP in boss.udict so we can reduce each time
@@ -393,7 +476,7 @@ def handle_boss_encounter():
     # Animate Boss rotating
     boss.rotation_y += 40 * time.dt
 
-    if dist_to_boss < 3:
+    if near_boss and distance(player.position, boss.position) < 3:
         # "Damage" boss
         boss.hp -= 1
         boss.blink(color.red)
@@ -406,37 +489,32 @@ def handle_boss_encounter():
         if boss.hp <= 0:
             print("Big Bob-omb defeated! Star appears.")
             spawn_star_at(boss.position + Vec3(0, 3, 0))
-            destroy(boss)
-            boss.disable()
+            collision_grid.remove(boss)
+            pools.release(boss)
 
             # Just for final effect
-            confetti = Entity(
-                model='quad',
-                texture='white_cube',
-                color=color.random_color(),
-                position=boss.position,
-                scale=10
-            )
-            destroy(confetti, delay=1)
+            confetti = pools.acquire('confetti', color=color.random_color(), position=boss.position)
+            pools.release_after(confetti, 1)
 
 def spawn_star_at(position):
-    """Create the star entity at specified position."""
+    """Put the star at specified position."""
     global star_entity
-    star_entity = Entity(
-        model='sphere',
-        color=color.yellow,
-        scale=1,
-        position=position
-    )
-    # rotate it or bob it in its own update
-    def star_spin():
-        if star_entity:
-            star_entity.rotation_y += 90 * time.dt
-            star_entity.y = position.y + math.sin(time.time()*4)*0.5
-    star_entity.update = star_spin
-    game_entities.append(star_entity)
+    star_entity = pools.acquire('star', position=position, base_y=position.y)
+    collision_grid.insert(star_entity, position, 1, tag='star')
 
 # -------------------------------------------------------------------
 # RUN
 # -------------------------------------------------------------------
-app.run()
+def start_if_in_menu():
+    """Headless runs skip the menu and go straight into a new round."""
+    if menu_ui.enabled:
+        start_game()
+
+if headless_requested():
+    run_headless(app, before_tick=start_if_in_menu)
+elif bench_requested():
+    run_bench(app, start=start_game, sample=lambda: update_tiers.counts)
+elif replay.replaying:
+    replay.run(start_game)
+else:
+    app.run()
@@ -2,8 +2,22 @@ from ursina import *
 from ursina.shaders import lit_with_shadows_shader
 from random import randint
 import math
+from headless import window_type
+from benchmark import bench_requested, population, report_start_time, run_bench
+from levelcache import load_level
+from fixedstep import FixedStepBody
+from terrain import Terrain
+from collisionlayers import CollisionLayers
+from activation import Activation
+from flowfield import FlowField
+from collisionproxy import use_proxy_collider
+from instancing import InstancedProps
+from updatetiers import UpdateTiers
+from replay import ReplaySession
 
-app = Ursina()
+app = Ursina(window_type=window_type())
+# --record FILE saves this session's input and random seed, --replay FILE plays it back
+replay = ReplaySession(app)
 # Game states
 class GameState:
     MENU = 0
@@ -78,6 +92,7 @@ class MainMenu(Entity):
         self.star.y = 0.3 + math.cos(self.t * 3) * 0.05
         self.star.rotation_z += 100 * time.dt
 
+    @replay.round_start
     def start_game(self):
         global current_state
         current_state = GameState.PLAYING
@@ -145,42 +160,72 @@ Main Menu Added by: CatGPT"""
         self.disable()
         main_menu.enable()
 
-def setup_scene():
-    global ground, mountain, chomp, boulders, bobombs, bridge, floating_island, power_star, score_text
-    window.color = color.light_gray
-    ground = Entity(
+def build_static_scene(batch):
+    """Everything in the scene that never moves."""
+    batch.add(Entity(
         model='plane', 
         scale=(50,1,50), 
         texture='white_cube', 
         texture_scale=(10,10), 
-        collider='box'
-    )
+        collider='box',
+        name='ground'
+    ))
     mountain = MountainTerrain()
-    chomp = ChainChomp()
-    boulders = [RollingBoulder((x*10,5,40), (x*10,5,55)) for x in range(-2,3)]
-    bobombs = [Bobomb((randint(-20,20),3,randint(25,45))) for _ in range(10)]
-    bridge = Entity(
+    mountain.name = 'mountain'
+    batch.add(mountain)
+    batch.add(Entity(
         model='cube', 
         scale=(15,0.2,3), 
         position=(0,8,25),
         texture='white_cube',
         collider='box',
-        rotation=(0,0,5)
-    )
-    floating_island = Entity(
+        rotation=(0,0,5),
+        name='bridge'
+    ))
+    batch.add(Entity(
         model='cube',
         scale=(5,1,5),
         position=(0,25,40),
         texture='white_cube',
-        collider='box'
-    )
+        collider='box',
+        name='floating_island'
+    ))
+
+def setup_scene():
+    global ground, mountain, chomp, boulders, bobombs, bridge, floating_island, power_star, score_text, chase_field
+    global boulder_props, bobomb_props
+    window.color = color.light_gray
+    # Static geometry comes merged from the level cache, rebuilt only when it changed
+    level = load_level('bob_scene', build_static_scene, depends=(MountainTerrain,))
+    ground, mountain = level['ground'], level['mountain']
+    bridge, floating_island = level['bridge'], level['floating_island']
+    terrain.clear()
+    for surface in (ground, mountain, bridge, floating_island):
+        terrain.add(surface)
+    layers.add(level.root, 'terrain')
+    # Walkable grid for the bob-ombs; the floating island is out of their reach
+    # The player (speed 8) crosses a 1-unit cell every 7.5 frames at 60 FPS, so a field must be done in fewer
+    chase_field = FlowField(terrain, terrain.low, terrain.high, step_height=STEP_HEIGHT,
+                            below=floating_island.y - 1, solve_frames=CHASE_SOLVE_FRAMES)
+    update_tiers.clear()
+    chomp = update_tiers.add(layers.add(ChainChomp(), 'hazards'), 'chain_chomp')
+    # Boulders and bob-ombs keep their colliders; each kind draws as one instanced node
+    boulder_props = InstancedProps('sphere', 5, texture='white_cube')
+    boulders = [update_tiers.add(layers.add(RollingBoulder((x*10,5,40), (x*10,5,55)), 'hazards'), 'boulder')
+                for x in range(-2,3)]
+    bobomb_activation.clear()
+    bobomb_count = population('bobombs', 10)
+    bobomb_props = InstancedProps('sphere', bobomb_count, color=color.black)
+    bobombs = [bobomb_activation.add(layers.add(Bobomb((randint(-20,20),3,randint(25,45))), 'enemies'))
+               for _ in range(bobomb_count)]
     power_star = Entity(
         model='sphere',
         color=color.yellow,
         scale=0.5,
-        position=floating_island.position + Vec3(0,2,0),
-        collider='mesh'
+        position=floating_island.position + Vec3(0,2,0)
     )
+    use_proxy_collider(power_star)
+    layers.add(power_star, 'pickups')
     score_text = Text(text='Stars: 0', position=(-0.85, 0.45), origin=(-0.5,-0.5))
     Sky(texture='sky_default')
 
@@ -202,6 +247,8 @@ class Player(Entity):
         self.grounded = False
         self.invincible = False
         self.invincible_timer = 0
+        # Movement runs at a fixed rate, drawn interpolated between steps
+        self.physics = FixedStepBody(self, self.physics_step)
         camera.parent = self.camera_pivot
         camera.position = (0, 1, -8)
         camera.rotation = (15, 0, 0)
@@ -209,39 +256,47 @@ class Player(Entity):
     def update(self):
         if current_state != GameState.PLAYING:
             return
+        self.physics.update(time.dt)
+        self.camera_pivot.rotation_y += mouse.velocity[0] * 30
+        self.camera_pivot.rotation_x = clamp(
+            self.camera_pivot.rotation_x - mouse.velocity[1] * 30,
+            -60, 60
+        )
+
+    def physics_step(self, dt):
         movement = self.camera_pivot.forward * (held_keys['w'] - held_keys['s']) + \
                    self.camera_pivot.right * (held_keys['d'] - held_keys['a'])
         if movement.length() > 0:
             movement = movement.normalized()
         self.velocity.x = movement.x * self.speed
         self.velocity.z = movement.z * self.speed
-        self.velocity.y -= self.gravity * time.dt  # Fixed gravity calculation [[6]]
-        self.grounded = self.intersects(ground).hit
-        if self.grounded and self.velocity.y < 0:
+        self.velocity.y -= self.gravity * dt  # Fixed gravity calculation [[6]]
+        self.position += self.velocity * dt
+        # Stand on the highest surface under our feet, stepping up small ledges
+        feet = self.y - self.scale_y / 2
+        floor = terrain.height(self.x, self.z, below=feet + STEP_HEIGHT)
+        self.grounded = floor is not None and self.velocity.y <= 0 and feet <= floor
+        if self.grounded:
+            self.y = floor + self.scale_y / 2
             self.velocity.y = 0
-        self.position += self.velocity * time.dt
         if self.y < -10:
             self.position = (0,10,0)
             self.velocity = Vec3(0,0,0)  # Reset velocity on respawn [[7]]
             self.invincible = True
             self.invincible_timer = 2
-        self.camera_pivot.rotation_y += mouse.velocity[0] * 30
-        self.camera_pivot.rotation_x = clamp(
-            self.camera_pivot.rotation_x - mouse.velocity[1] * 30,
-            -60, 60
-        )
+            self.physics.snap()
         if self.invincible:
-            self.invincible_timer -= time.dt
+            self.invincible_timer -= dt
             if self.invincible_timer <= 0:
                 self.invincible = False
 
     def input(self, key):
+        global current_state
         if current_state != GameState.PLAYING:
             return
         if key == 'space' and self.grounded:
             self.velocity.y = self.jump_height
         if key == 'escape':
-            global current_state
             current_state = GameState.MENU
             mouse.locked = False
             main_menu.enable()
@@ -253,28 +308,35 @@ class MountainTerrain(Entity):
             scale=(30,10,30),
             position=(0,5,30),
             rotation=(0,0,15),
-            texture='white_cube',
-            collider='mesh'
+            texture='white_cube'
         )
+        use_proxy_collider(self)
 
 class Bobomb(Entity):
     def __init__(self, position):
         super().__init__(
-            model='sphere',
-            color=color.black,
             scale=0.8,
             position=position,
             collider='sphere'
         )
+        self.slot = bobomb_props.add()  # drawn by bobomb_props, not by its own model
+        bobomb_props.follow(self.slot, self)
         self.speed = 2.5
 
-    def update(self):
-        if current_state != GameState.PLAYING:
-            return
-        self.rotation_y += 70 * time.dt
+    def tick(self, dt):
+        """Called by bobomb_activation, only while the player is close."""
+        self.rotation_y += 70 * dt
         if distance(self, player) < 5 and not player.invincible:
-            direction = (player.position - self.position).normalized()
-            self.position += direction * self.speed * time.dt  # Fixed movement vector [[3]]
+            # Follow the flow field around cliffs and the mountain; straight at the
+            # player once in the same cell, stand still if there's no way there
+            direction = chase_field.direction(self.x, self.z)
+            if direction is not None:
+                if direction == Vec3(0,0,0):
+                    direction = Vec3(player.x - self.x, 0, player.z - self.z).normalized()
+                self.position += direction * self.speed * dt  # Fixed movement vector [[3]]
+                rest_on_terrain(self)
+        # Always, so the spin above reaches the instanced visual even when standing still
+        bobomb_props.follow(self.slot, self)
 
 class ChainChomp(Entity):
     def __init__(self):
@@ -285,50 +347,78 @@ class ChainChomp(Entity):
             position=(10,3,15),
             collider='sphere'
         )
-        self.chain = [Entity(model='sphere', color=color.gray, scale=0.15) for _ in range(8)]
+        # The 8 links are copies in one instanced node; tick() writes their positions in bulk
+        self.chain = InstancedProps('sphere', 8, color=color.gray)
+        for _ in range(8):
+            self.chain.add(scale=0.15)
         self.anchor = Entity(position=(10,5,15))
         self.t = 0
 
-    def update(self):
-        if current_state != GameState.PLAYING:
-            return
-        self.t += time.dt * 1.5
+    def tick(self, dt):
+        """Called by update_tiers, less often the further the chomp is from the camera."""
+        self.t += dt * 1.5
         self.position = self.anchor.position + Vec3(math.sin(self.t*2)*4, 0, math.cos(self.t*2)*4)
-        for i, link in enumerate(self.chain):
-            link.position = lerp(self.anchor.position, self.position, i/len(self.chain))
+        links = self.chain.count
+        self.chain.positions[:] = [lerp(self.anchor.position, self.position, i/links) for i in range(links)]
+        self.chain.dirty = True
 
 class RollingBoulder(Entity):
     def __init__(self, path_start, path_end):
         super().__init__(
-            model='sphere',
-            texture='white_cube',
             scale=2,
             position=path_start,
             collider='sphere'
         )
-        self.path = [path_start, path_end]
+        self.slot = boulder_props.add()  # drawn by boulder_props
+        boulder_props.follow(self.slot, self)
+        self.path = [Vec3(path_start), Vec3(path_end)]
         self.speed = 4
         self.direction = 1
 
-    def update(self):
-        if current_state != GameState.PLAYING:
-            return
+    def tick(self, dt):
+        """Called by update_tiers, less often the further the boulder is from the camera."""
         target = self.path[0] if self.direction == -1 else self.path[1]
-        direction = (target - self.position).normalized()
-        self.position += direction * self.speed * time.dt  # Fixed movement logic [[3]]
-        self.rotation_y += 150 * time.dt
-        if distance(self, target) < 1:
+        # Roll along the path on the ground; the terrain decides the height
+        direction = Vec3(target.x - self.x, 0, target.z - self.z).normalized()
+        self.position += direction * self.speed * dt  # Fixed movement logic [[3]]
+        rest_on_terrain(self)
+        self.rotation_y += 150 * dt
+        boulder_props.follow(self.slot, self)
+        if distance_xz(self, target) < 1:
             self.direction *= -1
 
+STEP_HEIGHT = 0.5   # how high a ledge the player walks up without jumping
+CHASE_SOLVE_FRAMES = 4   # updates one bob-omb flow field may take
+
+def rest_on_terrain(entity):
+    """Drop or lift a sphere-shaped entity so it sits on the surface under it, if any."""
+    radius = entity.scale_y / 2
+    floor = terrain.height(entity.x, entity.z, below=entity.y - radius + STEP_HEIGHT)
+    if floor is not None:
+        entity.y = floor + radius
+
 score = 0
 player = None
 main_menu = MainMenu()
 credits_menu = CreditsMenu()
 ground = None
 mountain = None
+terrain = Terrain()
+# Who can touch what; queries only walk the layers they ask for
+layers = CollisionLayers('player', 'terrain', 'enemies', 'hazards', 'pickups')
+# Bob-ombs sleep until the player comes near; they start chasing at 5 units
+bobomb_activation = Activation(wake_radius=6)
+chase_field = None
+# Hazards tick less often far from the camera and not at all out of range
+update_tiers = UpdateTiers()
+update_tiers.register('chain_chomp', near=30, far=80, every=3,
+                      models={'near': 'sphere', 'mid': 'icosphere', 'far': 'icosphere'})
+update_tiers.register('boulder', near=30, far=80, every=3)
 chomp = None
 boulders = None
+boulder_props = None
 bobombs = None
+bobomb_props = None
 bridge = None
 floating_island = None
 power_star = None
@@ -338,7 +428,10 @@ def update():
     if current_state != GameState.PLAYING:
         return
     global score
-    hit_info = player.intersects()
+    chase_field.update(player.position)
+    bobomb_activation.update(player.position, time.dt)
+    update_tiers.update(time.dt)
+    hit_info = layers.intersects(player, 'pickups', 'enemies')
     if hit_info.hit:
         if hit_info.entity == power_star:
             score += 1
@@ -351,14 +444,22 @@ def update():
             player.velocity = Vec3(0,0,0)  # Reset velocity on hit [[7]]
             player.invincible = True
             player.invincible_timer = 2
+            bobomb_activation.remove(hit_info.entity)
+            bobomb_props.remove(hit_info.entity.slot)
             destroy(hit_info.entity)
             bobombs.remove(hit_info.entity)
 
 def start_game():
     global player, score
+    report_start_time()
     score = 0
     setup_scene()
-    player = Player()
+    player = layers.add(Player(), 'player')
     mouse.locked = True
 
-app.run()
+if bench_requested():
+    run_bench(app, start=main_menu.start_game, sample=lambda: update_tiers.counts)
+elif replay.replaying:
+    replay.run(main_menu.start_game)
+else:
+    app.run()
@@ -0,0 +1,76 @@
+"""
+Sleep/wake activation for crowds of enemies.
+
+Enemies handed to an Activation sit asleep in a SpatialHash. Every frame
+update(center, dt) asks the grid for the ones within wake_radius of center
+(usually the player), wakes them, and calls tick(dt) on the awake ones only.
+Anything that wanders further than sleep_radius goes back to sleep.
+sleep_radius is a bit larger than wake_radius, so something sitting right at
+the edge doesn't flip every frame.
+
+Sleeping entities are also taken out of scene.entities, the list Ursina walks
+every frame for update() and every event for input(), the same way Ursina
+keeps its own helper entities out of it (add_to_scene_entities=False). They
+still render and collide. So the per-frame cost follows the number of enemies
+near the player, not the number in the level.
+"""
+
+from ursina import scene
+
+from spatialhash import SpatialHash
+
+
+class Activation:
+    def __init__(self, wake_radius, sleep_radius=None, cell_size=None):
+        self.wake_radius = wake_radius
+        self.sleep_radius = wake_radius * 1.25 if sleep_radius is None else sleep_radius
+        self.grid = SpatialHash(cell_size or wake_radius)
+        self.awake = {}         # entity -> None, dicts keep insertion order
+        self._to_park = set()   # added since the last update, still in scene.entities
+
+    def add(self, entity):
+        """Manage entity from now on; it needs a tick(dt) method. Returns entity."""
+        entity.ignore = True    # never let Ursina's loop update it, we tick it while it's awake
+        self.grid.insert(entity, entity.position)
+        self._to_park.add(entity)
+        return entity
+
+    def remove(self, entity):
+        """Stop managing entity, e.g. before destroying it. It goes back into scene.entities."""
+        self.grid.remove(entity)
+        self.awake.pop(entity, None)
+        self._to_park.discard(entity)
+        if entity not in scene.entities:
+            scene.entities.append(entity)
+
+    def clear(self):
+        for entity in list(self.grid.entries):
+            self.remove(entity)
+
+    def _park_new(self):
+        # One pass over scene.entities for a whole batch of adds, not one per add.
+        scene.entities[:] = [e for e in scene.entities if e not in self._to_park]
+        self._to_park.clear()
+
+    def update(self, center, dt):
+        if self._to_park:
+            self._park_new()
+        cx, cz = center[0], center[2]
+        wake, sleep = self.wake_radius ** 2, self.sleep_radius ** 2
+
+        for entity in self.grid.query(center, self.wake_radius):
+            if entity not in self.awake:
+                position = entity.position
+                if (position.x - cx) ** 2 + (position.z - cz) ** 2 <= wake:
+                    self.awake[entity] = None
+                    scene.entities.append(entity)
+
+        for entity in list(self.awake):
+            position = entity.position
+            if (position.x - cx) ** 2 + (position.z - cz) ** 2 > sleep:
+                del self.awake[entity]
+                scene.entities.remove(entity)
+                continue
+            if entity.enabled:
+                entity.tick(dt)
+                self.grid.update(entity, entity.position)
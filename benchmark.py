@@ -0,0 +1,259 @@
+"""
+Frame-cost benchmarks for every shipped scene.
+
+    python benchmark.py
+    python benchmark.py --scenes _0.py,CASTLE-V0.py --sizes 1,10,100 --frames 600 --out bench_results.json
+
+Each scene is launched in its own process with --offscreen --bench and a
+population scale in KOOPA_SCALE. Scenes size their boulders, bob-ombs, fence
+posts, trees, ... through population(), run a fixed number of frames on the
+fixed simulation clock and print one JSON line of per-frame update/render
+timings. The runner collects those lines into a single JSON file that can be
+diffed between commits.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from time import perf_counter
+
+BENCH_FLAG = '--bench'
+FRAMES_FLAG = '--frames'
+SCALE_ENV = 'KOOPA_SCALE'
+RESULT_PREFIX = 'KOOPA_BENCH_RESULT '
+
+SCENES = ['KoopaEngineM1.py', 'K1-EngineM1.py', '_0.py', 'B3313-BOB.py', 'CASTLE-V0.py', 'renderfx.py']
+DEFAULT_SIZES = [1, 4, 16, 64]
+DEFAULT_FRAMES = 300
+WARMUP_FRAMES = 30
+RUN_TIMEOUT = 600
+
+
+# -------------------------------------------------------------------
+# SCENE SIDE
+# -------------------------------------------------------------------
+def population(name, default):
+    """How many of something a scene should spawn.
+
+    Normally just default; under the benchmark it is multiplied by KOOPA_SCALE.
+    KOOPA_<NAME> (e.g. KOOPA_BOULDERS=500) sets an exact count.
+    """
+    override = os.environ.get(f'KOOPA_{name.upper()}')
+    if override is not None:
+        return int(override)
+    return max(0, round(default * float(os.environ.get(SCALE_ENV, 1))))
+
+
+def bench_requested(argv=None):
+    """True if the scene was launched by the benchmark runner."""
+    return BENCH_FLAG in (sys.argv if argv is None else argv)
+
+
+def frames_requested(argv=None, default=DEFAULT_FRAMES):
+    argv = sys.argv if argv is None else argv
+    if FRAMES_FLAG in argv:
+        return int(argv[argv.index(FRAMES_FLAG) + 1])
+    return default
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """mean/p95/p99/max of a list of durations in seconds, reported in ms."""
+    if not samples:
+        return {'mean_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+class FrameTimer:
+    """Collects per-frame update and render durations."""
+
+    def __init__(self):
+        self.update = []
+        self.render = []
+        self.samples = []   # optional {name: number} per frame, e.g. entities per update tier
+
+    def add(self, update_seconds, render_seconds, sample=None):
+        self.update.append(update_seconds)
+        self.render.append(render_seconds)
+        if sample is not None:
+            self.samples.append(dict(sample))
+
+    def clear(self):
+        self.update.clear()
+        self.render.clear()
+        self.samples.clear()
+
+    def report(self, **extra):
+        """Print the result line the runner looks for, and return it as a dict."""
+        result = dict(extra)
+        result['frames'] = len(self.update)
+        result['update'] = summarize(self.update)
+        result['render'] = summarize(self.render)
+        if self.samples:
+            result['per_frame'] = {name: sum(s[name] for s in self.samples) / len(self.samples)
+                                   for name in self.samples[0]}
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        return result
+
+
+def report_start_time(label='Start'):
+    """Call first thing in a start handler to print how long it takes until the next frame is on screen.
+
+    Covers whatever the handler builds plus the first render, i.e. the wait
+    between clicking Start and being able to play.
+    """
+    from ursina import application
+
+    clicked = perf_counter()
+
+    def first_frame(task):
+        print(f"{label}: {(perf_counter() - clicked) * 1000:.1f} ms from click to first playable frame")
+        return task.done
+
+    # Sort 51 runs right after ShowBase's igLoop has rendered the frame.
+    application.base.taskMgr.add(first_frame, 'report-start-time', sort=51)
+
+
+def run_bench(app, frames=None, start=None, sample=None):
+    """Time frames of an Ursina scene, print the result line and exit.
+
+    Timing marks are Panda3D tasks sorted around Ursina's 'update' task and
+    ShowBase's 'igLoop' (sort 50): everything up to the igLoop counts as
+    update, the igLoop itself (cull + draw) counts as render. start_ms is
+    start() plus the first frame, the same span report_start_time() prints.
+    sample, if given, is called every timed frame and returns {name: number};
+    the per-frame means go into the result as per_frame.
+    """
+    from ursina import scene
+    from headless import use_fixed_clock
+
+    frames = frames_requested() if frames is None else frames
+    timer = FrameTimer()
+    marks = {}
+
+    def frame_start(task):
+        marks['start'] = perf_counter()
+        return task.cont
+
+    def update_done(task):
+        marks['update'] = perf_counter()
+        return task.cont
+
+    def render_done(task):
+        if 'start' in marks:
+            now = perf_counter()
+            timer.add(marks['update'] - marks['start'], now - marks['update'], sample() if sample else None)
+        return task.cont
+
+    app.taskMgr.add(frame_start, 'bench-frame-start', sort=-1000)
+    app.taskMgr.add(update_done, 'bench-update-done', sort=49)
+    app.taskMgr.add(render_done, 'bench-render-done', sort=51)
+
+    use_fixed_clock()
+    started = perf_counter()
+    if start:
+        start()
+    app.step()
+    start_ms = (perf_counter() - started) * 1000
+    for _ in range(WARMUP_FRAMES - 1):
+        app.step()
+    timer.clear()
+    for _ in range(frames):
+        app.step()
+
+    timer.report(scene=os.path.basename(sys.argv[0]), entities=len(scene.entities), start_ms=start_ms)
+    sys.exit(0)
+
+
+# -------------------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------------------
+def _arg(argv, flag, default):
+    if flag in argv:
+        return argv[argv.index(flag) + 1]
+    return default
+
+
+def _git_commit(repo):
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_scene(script, scale, frames, repo, extra_args=()):
+    """Run one scene at one population scale and return its result dict."""
+    env = dict(os.environ)
+    env[SCALE_ENV] = str(scale)
+    env.setdefault('SDL_VIDEODRIVER', 'dummy')
+    env.setdefault('SDL_AUDIODRIVER', 'dummy')
+    cmd = [sys.executable, os.path.join(repo, script), '--offscreen', BENCH_FLAG, FRAMES_FLAG, str(frames), *extra_args]
+    try:
+        proc = subprocess.run(cmd, cwd=repo, env=env, capture_output=True, text=True, timeout=RUN_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return {'scene': script, 'scale': scale, 'error': f'timed out after {RUN_TIMEOUT}s'}
+
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            result['scene'] = script
+            result['scale'] = scale
+            return result
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+    return {'scene': script, 'scale': scale, 'error': '\n'.join(tail) or f'exit code {proc.returncode}'}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    repo = os.path.dirname(os.path.abspath(__file__))
+    scenes = _arg(argv, '--scenes', ','.join(SCENES)).split(',')
+    sizes = [float(s) for s in _arg(argv, '--sizes', ','.join(map(str, DEFAULT_SIZES))).split(',')]
+    frames = int(_arg(argv, FRAMES_FLAG, DEFAULT_FRAMES))
+    out = _arg(argv, '--out', 'bench_results.json')
+    # Same recorded input for every scene, so two builds play the exact same session
+    replay = _arg(argv, '--replay', None)
+    extra_args = ('--replay', os.path.abspath(replay)) if replay else ()
+
+    results = []
+    for script in scenes:
+        for scale in sizes:
+            result = run_scene(script, scale, frames, repo, extra_args)
+            results.append(result)
+            if 'error' in result:
+                print(f"{script} x{scale:g}: FAILED\n{result['error']}")
+            else:
+                print(f"{script} x{scale:g}: {result['entities']} entities, "
+                      f"update {result['update']['mean_ms']:.2f}/{result['update']['p99_ms']:.2f} ms, "
+                      f"render {result['render']['mean_ms']:.2f}/{result['render']['p99_ms']:.2f} ms (mean/p99)"
+                      + (f", start {result['start_ms']:.0f} ms" if 'start_ms' in result else '')
+                      + ''.join(f", {name} {value:.1f}/frame" for name, value in result.get('per_frame', {}).items()))
+
+    report = {
+        'commit': _git_commit(repo),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'frames': frames,
+        'results': results,
+    }
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == '__main__':
+    main()
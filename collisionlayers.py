@@ -0,0 +1,87 @@
+"""
+Collision layers: entities declare what they are, queries declare what they
+care about.
+
+Each layer gets a root entity and a collide-mask bit. add() moves an entity
+under its layer's root and tags its collider with the layer's bit. A query
+names the layers (the mask) it wants and only those roots are traversed, so
+asking "am I touching a pickup?" never looks at the level geometry or the
+boulders. Queries also skip Entity.intersects()'s per-call scan over every
+entity in the scene, which on its own grows with the size of the level.
+
+    layers = CollisionLayers('terrain', 'enemies', 'pickups')
+    layers.add(star, 'pickups')
+    hit = layers.intersects(player, 'pickups', 'enemies')
+    if hit: print(hit.entity)
+"""
+
+from panda3d.core import BitMask32, CollisionHandlerQueue, CollisionNode, CollisionTraverser
+from ursina import Entity
+from ursina.hit_info import HitInfo
+
+
+class CollisionLayers:
+    def __init__(self, *names):
+        self.roots = {}
+        self.bits = {}
+        self.pickers = {}    # querying entity -> (traverser, queue, picker node)
+        for name in names:
+            self.add_layer(name)
+
+    def add_layer(self, name):
+        if len(self.bits) == 32:
+            raise ValueError('at most 32 collision layers')
+        self.bits[name] = BitMask32.bit(len(self.bits))
+        self.roots[name] = Entity(name=f'{name}_layer')
+        return self.roots[name]
+
+    def add(self, entity, layer):
+        """Put entity (and everything under it) on layer. Returns entity."""
+        # Layer roots sit at the origin, so this keeps the entity where it is.
+        entity.parent = self.roots[layer]
+        for collider_np in entity.findAllMatches('**/+CollisionNode'):
+            if collider_np.name != 'layer_picker':
+                collider_np.node().setIntoCollideMask(self.bits[layer])
+        return entity
+
+    def _picker(self, entity):
+        picker = self.pickers.get(entity)
+        if picker is None or picker[2].isEmpty():
+            node = CollisionNode('layer_picker')
+            node.setIntoCollideMask(BitMask32.allOff())
+            node.addSolid(entity.collider.shape)
+            node_path = entity.attachNewNode(node)
+            traverser, queue = CollisionTraverser(), CollisionHandlerQueue()
+            traverser.addCollider(node_path, queue)
+            picker = self.pickers[entity] = (traverser, queue, node_path)
+        return picker
+
+    def intersects(self, entity, *layers, ignore=()):
+        """Like entity.intersects(), but only against the given layers.
+
+        Layers are tried in order and the first one with a hit wins.
+        """
+        if not entity.collider or not entity.collision:
+            return HitInfo(hit=False)
+        traverser, queue, node_path = self._picker(entity)
+        for layer in layers:
+            node_path.node().setFromCollideMask(self.bits[layer])
+            traverser.traverse(self.roots[layer])
+            if not queue.getNumEntries():
+                continue
+            queue.sortEntries()
+            entities = []
+            for collision in queue.getEntries():
+                hit = collision.getIntoNodePath().parent.getPythonTag('Entity')
+                if hit is None or hit is entity or hit in ignore or not hit.collision or hit in entities:
+                    continue
+                entities.append(hit)
+            if entities:
+                return HitInfo(hit=True, entity=entities[0], entities=entities)
+        return HitInfo(hit=False)
+
+    def forget(self, entity):
+        """Drop the cached picker of an entity that is being destroyed."""
+        picker = self.pickers.pop(entity, None)
+        if picker and not picker[2].isEmpty():
+            picker[2].removeNode()
@@ -0,0 +1,66 @@
+"""
+Collision proxies: the cheapest correct collision shape for an entity.
+
+collider='mesh' turns every triangle of a model into a CollisionPolygon, so
+every raycast and intersects() against it walks all of them. Most level
+pieces are simple shapes, so use_proxy_collider() picks a primitive instead:
+
+    plane, quad, cube         -> box (exact, in the entity's own space)
+    sphere, uniformly scaled  -> sphere
+    anything else             -> triangle mesh, as before
+
+Cylinders keep their triangles too: Panda3D 1.10's CollisionCapsule returns
+bogus hits for rays along its axis, which is exactly what a ground check
+on top of a tower fires. Terrain-like meshes stay meshes as well, since there
+is no convex hull or general heightfield collision solid to swap in.
+
+The shape chosen for a (model, origin, scale) combination is compiled once
+and cached, so building the same prop many times only pays for it once.
+"""
+
+from ursina.collider import BoxCollider, SphereCollider
+
+BOX_MODELS = ('plane', 'quad', 'cube')
+proxy_cache = {}
+
+
+def _model_name(entity):
+    model = entity.model
+    return getattr(model, 'name', None) if model else None
+
+
+def compile_proxy(entity):
+    """Work out (shape, params) for entity's collider, cached per model/origin/scale."""
+    name = _model_name(entity)
+    if name is None:
+        return (None, {})   # no model, nothing to collide with
+    scale = tuple(round(v, 4) for v in entity.scale)
+    key = (name, tuple(entity.origin), scale)
+    if key in proxy_cache:
+        return proxy_cache[key]
+
+    bounds = entity.model_bounds
+    center, size = tuple(bounds.center), tuple(bounds.size)
+    sx, sy, sz = scale
+
+    if name in BOX_MODELS:
+        proxy = ('box', {'center': center, 'size': size})
+    elif name == 'sphere' and sx == sy == sz:
+        proxy = ('sphere', {'center': center, 'radius': max(size) / 2})
+    else:
+        proxy = ('mesh', {})
+
+    proxy_cache[key] = proxy
+    return proxy
+
+
+def use_proxy_collider(entity):
+    """Give entity the cheapest collider that fits its model. Returns the shape name."""
+    shape, params = compile_proxy(entity)
+    if shape == 'box':
+        entity.collider = BoxCollider(entity, **params)
+    elif shape == 'sphere':
+        entity.collider = SphereCollider(entity, **params)
+    elif shape == 'mesh':
+        entity.collider = 'mesh'
+    return shape
@@ -0,0 +1,102 @@
+"""
+Entity pools, so gameplay and the menu -> game -> menu loop recycle nodes
+instead of constructing and destroying them.
+
+Every prefab is registered once with a function that builds a fresh entity.
+acquire() hands out a disabled entity of that prefab if there is one and only
+calls the builder when the pool has run dry. release() disables the entity
+(which also stashes it out of rendering and collisions) and puts it back.
+Attributes passed to acquire() are set every time the entity is handed out,
+so whatever changes from one use to the next (position, color, text, hp)
+belongs there rather than in the builder.
+"""
+
+from ursina import invoke
+
+
+class EntityPool:
+    """Spare entities of a single prefab."""
+
+    def __init__(self, prefab, build, reset=None):
+        self.prefab = prefab
+        self.build = build
+        self.reset = reset          # optional reset(entity), called on every acquire
+        self.free = []
+        self.live = {}              # entity -> None, dicts keep insertion order
+        self.created = 0
+
+    def reserve(self, count):
+        """Build entities up front so the first uses don't have to."""
+        while len(self.free) + len(self.live) < count:
+            entity = self._create()
+            entity.enabled = False
+            self.free.append(entity)
+
+    def _create(self):
+        entity = self.build()
+        entity.pool = self
+        entity.pool_lease = 0
+        self.created += 1
+        return entity
+
+    def acquire(self, **attrs):
+        entity = self.free.pop() if self.free else self._create()
+        entity.pool_lease += 1
+        for name, value in attrs.items():
+            setattr(entity, name, value)
+        if self.reset:
+            self.reset(entity)
+        entity.enabled = True
+        self.live[entity] = None
+        return entity
+
+    def release(self, entity):
+        if entity not in self.live:
+            return      # already back in the pool
+        del self.live[entity]
+        # blink(), animate_*() etc. would otherwise keep running on the spare
+        for animation in entity.animations:
+            animation.kill()
+        entity.animations.clear()
+        entity.enabled = False
+        self.free.append(entity)
+
+    def release_all(self):
+        for entity in list(self.live):
+            self.release(entity)
+
+
+class EntityPools:
+    """One EntityPool per prefab name."""
+
+    def __init__(self):
+        self.pools = {}
+
+    def register(self, prefab, build, reset=None, reserve=0):
+        pool = EntityPool(prefab, build, reset)
+        pool.reserve(reserve)
+        self.pools[prefab] = pool
+        return pool
+
+    def acquire(self, prefab, **attrs):
+        return self.pools[prefab].acquire(**attrs)
+
+    def release(self, entity):
+        entity.pool.release(entity)
+
+    def release_after(self, entity, delay):
+        """Release entity after delay seconds, unless it has been released and reused by then."""
+        lease = entity.pool_lease
+
+        def release_if_same_lease():
+            if entity.pool_lease == lease:
+                entity.pool.release(entity)
+        invoke(release_if_same_lease, delay=delay)
+
+    def release_all(self):
+        for pool in self.pools.values():
+            pool.release_all()
+
+    def stats(self):
+        """{prefab: (built, in use, spare)} for checking nothing is being rebuilt."""
+        return {name: (pool.created, len(pool.live), len(pool.free)) for name, pool in self.pools.items()}
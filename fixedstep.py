@@ -0,0 +1,90 @@
+"""
+Fixed-timestep physics with render interpolation.
+
+Frame times vary, physics shouldn't. FixedStep puts each frame's time into an
+accumulator and runs the simulation in whole steps of 1/rate seconds, so jump
+height, fall speed and collision results come out the same at 30 or 144 FPS,
+and the same inputs always give the same result. What is left over in the
+accumulator (alpha, 0..1 of a step) is used to blend between the last two
+simulated positions, so motion still looks smooth when frames come faster
+than steps.
+
+The rate comes from --physics-rate N (default 60). Lowering it on a slow
+machine saves CPU without changing how the game plays.
+"""
+
+import sys
+
+from ursina import Vec3, lerp
+
+PHYSICS_RATE_FLAG = '--physics-rate'
+DEFAULT_RATE = 60
+MAX_STEPS = 8   # per frame; past this a frame's time is dropped instead of spiralling
+
+
+def physics_rate(argv=None, default=DEFAULT_RATE):
+    argv = sys.argv if argv is None else argv
+    if PHYSICS_RATE_FLAG in argv:
+        return float(argv[argv.index(PHYSICS_RATE_FLAG) + 1])
+    return default
+
+
+class FixedStep:
+    """Calls step(dt) at a fixed rate, however long the frames are."""
+
+    def __init__(self, step, rate=DEFAULT_RATE, max_steps=MAX_STEPS):
+        self.step = step
+        self.dt = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, frame_dt):
+        """Run however many steps frame_dt covers. Returns alpha for interpolation."""
+        self.accumulator += frame_dt
+        steps = 0
+        while self.accumulator >= self.dt:
+            if steps == self.max_steps:
+                self.accumulator %= self.dt
+                break
+            self.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+        return self.accumulator / self.dt
+
+
+class FixedStepBody:
+    """Drives an entity's position from a fixed-step simulation.
+
+    step(dt) moves entity.position as usual; between steps the entity is shown
+    at a blend of its last two simulated positions. Anything that moves the
+    entity from outside the simulation (a respawn, a knockback) just sets
+    position, and the body picks that up as a teleport on the next update.
+    """
+
+    def __init__(self, entity, step, rate=None):
+        self.entity = entity
+        self.step = step
+        self.stepper = FixedStep(self._step, physics_rate() if rate is None else rate)
+        self.previous = self.current = self.rendered = Vec3(entity.position)
+        self._snapped = False
+
+    def snap(self):
+        """Call from step() after a teleport so it isn't interpolated across."""
+        self._snapped = True
+
+    def _step(self, dt):
+        self.previous = self.current
+        self.step(dt)
+        self.current = Vec3(self.entity.position)
+        if self._snapped:
+            self.previous = self.current
+            self._snapped = False
+
+    def update(self, frame_dt):
+        if self.entity.position != self.rendered:
+            self.previous = self.current = Vec3(self.entity.position)
+        # Collision checks inside step() need the entity at its simulated position.
+        self.entity.position = self.current
+        alpha = self.stepper.advance(frame_dt)
+        self.entity.position = lerp(self.previous, self.current, alpha)
+        self.rendered = Vec3(self.entity.position)
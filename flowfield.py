@@ -0,0 +1,143 @@
+"""
+Flow-field navigation for crowds chasing one target.
+
+The level's walkable area is sampled from a Terrain into a grid of cells.
+Two neighbouring cells are connected when both are walkable and their
+heights differ by no more than step_height, so cliffs and the sides of the
+mountain are walls. Diagonal moves need both orthogonal neighbours open,
+so nothing cuts corners.
+
+When the target (the player) moves into another cell, a Dijkstra search
+outwards from that cell starts. Every cell it reaches gets the direction to
+the neighbour it was reached from, i.e. one step along the shortest path to
+the target, so one pass over the grid yields the whole field. The search is
+spread over frames, at most budget cells per update(), and chasers keep
+following the previous field until the new one is finished.
+
+A search in progress is never thrown away. If the target changes cell
+meanwhile, the search finishes for the cell it started from and the next
+one starts from wherever the target is by then, so a moving target still
+gets a fresh field every few frames instead of none at all. Pass
+solve_frames to raise the budget until a whole search fits in that many
+updates; keep it below the frames the target needs to cross a cell.
+
+direction(x, z) is a single lookup, so any number of chasers can sample it
+every frame.
+"""
+
+import heapq
+import math
+
+from ursina import Vec3
+
+INF = float('inf')
+DIAGONAL = math.sqrt(2)
+
+
+class FlowField:
+    def __init__(self, terrain, low, high, cell_size=1.0, step_height=0.5, below=INF, budget=500, solve_frames=None):
+        """low/high are the (x, z) corners of the area to cover.
+
+        below is passed on to terrain.height(), e.g. to leave out floating
+        platforms nothing can walk up to.
+        """
+        self.cell_size = cell_size
+        self.budget = budget
+        self.x0, self.z0 = low
+        self.width = max(1, math.ceil((high[0] - low[0]) / cell_size))
+        self.depth = max(1, math.ceil((high[1] - low[1]) / cell_size))
+
+        self.heights = []
+        for row in range(self.depth):
+            for col in range(self.width):
+                x, z = self.center(row * self.width + col)
+                self.heights.append(terrain.height(x, z, below=below))
+
+        self.neighbours = [self._links(index, step_height) for index in range(len(self.heights))]
+        if solve_frames:
+            walkable = sum(1 for links in self.neighbours if links)
+            self.budget = max(budget, math.ceil(walkable / solve_frames))
+        self.flow = [None] * len(self.heights)  # cell -> (dx, dz) toward the target, None if no way there
+        self.goal = None        # the cell self.flow leads to
+        self.wanted = None      # the cell the target is in now
+        self._search = None
+
+    def center(self, index):
+        row, col = divmod(index, self.width)
+        return self.x0 + (col + 0.5) * self.cell_size, self.z0 + (row + 0.5) * self.cell_size
+
+    def cell(self, x, z):
+        """Index of the cell under (x, z), or None outside the grid."""
+        col = math.floor((x - self.x0) / self.cell_size)
+        row = math.floor((z - self.z0) / self.cell_size)
+        if 0 <= col < self.width and 0 <= row < self.depth:
+            return row * self.width + col
+        return None
+
+    def _links(self, index, step_height):
+        height = self.heights[index]
+        if height is None:
+            return ()
+        row, col = divmod(index, self.width)
+
+        def open_to(r, c):
+            if not (0 <= r < self.depth and 0 <= c < self.width):
+                return False
+            other = self.heights[r * self.width + c]
+            return other is not None and abs(other - height) <= step_height
+
+        # (neighbour, cost, unit (dx, dz) from the neighbour back to this cell)
+        links = []
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            if open_to(row + dr, col + dc):
+                links.append(((row + dr) * self.width + col + dc, 1.0, (-dc, -dr)))
+        for dr, dc in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+            if open_to(row + dr, col + dc) and open_to(row + dr, col) and open_to(row, col + dc):
+                links.append(((row + dr) * self.width + col + dc, DIAGONAL, (-dc / DIAGONAL, -dr / DIAGONAL)))
+        return tuple(links)
+
+    def update(self, target):
+        """Follow target (a position); does at most budget cells of search work."""
+        goal = self.cell(target[0], target[2])
+        if goal is not None and self.neighbours[goal]:
+            self.wanted = goal
+        # Only start a search when none is running; a running one always gets to finish
+        if self._search is None and self.wanted is not None and self.wanted != self.goal:
+            self._search = self._solve(self.wanted)
+        if self._search is not None and next(self._search, 'done') == 'done':
+            self._search = None
+
+    def _solve(self, goal):
+        neighbours, budget = self.neighbours, self.budget
+        distance = [INF] * len(neighbours)
+        distance[goal] = 0.0
+        flow = [None] * len(neighbours)
+        frontier = [(0.0, goal)]
+        work = 0
+        while frontier:
+            d, index = heapq.heappop(frontier)
+            if d > distance[index]:
+                continue
+            for other, cost, back in neighbours[index]:
+                if d + cost < distance[other]:
+                    distance[other] = d + cost
+                    flow[other] = back   # final once other is popped: its best way toward the goal
+                    heapq.heappush(frontier, (d + cost, other))
+            work += 1
+            if work % budget == 0:
+                yield
+        self.flow = flow
+        self.goal = goal
+
+    def direction(self, x, z):
+        """Unit Vec3 to walk in from (x, z) toward the target.
+
+        Vec3(0,0,0) in the target's own cell, None if there is no way to it.
+        """
+        index = self.cell(x, z)
+        if index is None:
+            return None
+        if index == self.goal:
+            return Vec3(0, 0, 0)
+        step = self.flow[index]
+        return None if step is None else Vec3(step[0], 0, step[1])
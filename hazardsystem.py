@@ -0,0 +1,165 @@
+"""
+Batched hazard simulation on NumPy arrays.
+
+Every hazard kind (boulders, chain chomps, ...) is a HazardBatch that keeps
+its hazards' base positions, velocities, rotations, spin rates, sway and
+respawn bounds in contiguous arrays, one row per hazard. HazardSystem.step()
+advances every batch with a handful of vectorized operations, then writes
+the results back to the Panda3D nodes with one setPosHpr() call per node
+instead of going through Ursina's per-axis property setters. If the system
+is given a SpatialHash, hazards are registered in it and only the ones that
+crossed into another cell are re-bucketed after each step.
+
+Per frame, for every row:
+
+    base     += velocity * dt
+    rotation += spin * dt
+    base      = random point in the respawn box, if base left the bounds
+    position  = base + sway * sin(sway_speed * t)
+"""
+
+import numpy as np
+from ursina import Entity
+
+INF = float('inf')
+
+
+class HazardBatch:
+    """All hazards of one kind."""
+
+    def __init__(self, kind, respawn_low=None, respawn_high=None,
+                 bounds_low=(-INF, -INF, -INF), bounds_high=(INF, INF, INF), sway_speed=1.0):
+        self.kind = kind
+        self.respawn_low = None if respawn_low is None else np.array(respawn_low, dtype=float)
+        self.respawn_high = None if respawn_high is None else np.array(respawn_high, dtype=float)
+        self.bounds_low = np.array(bounds_low, dtype=float)
+        self.bounds_high = np.array(bounds_high, dtype=float)
+        self.sway_speed = sway_speed
+
+        self.entities = []
+        self.count = 0
+        self._allocate(8)
+
+    def _allocate(self, capacity):
+        def grow(old, shape):
+            new = np.zeros(shape)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+
+        self.base = grow(getattr(self, 'base', None), (capacity, 3))
+        self.velocity = grow(getattr(self, 'velocity', None), (capacity, 3))
+        self.rotation = grow(getattr(self, 'rotation', None), (capacity, 3))
+        self.spin = grow(getattr(self, 'spin', None), (capacity, 3))
+        self.sway = grow(getattr(self, 'sway', None), (capacity, 3))
+        self.radius = grow(getattr(self, 'radius', None), (capacity,))
+        self.spans = grow(getattr(self, 'spans', None), (capacity, 4))
+        self.position = grow(getattr(self, 'position', None), (capacity, 3))
+
+    def add(self, entity, radius=0.0, velocity=(0, 0, 0), spin=(0, 0, 0), sway=(0, 0, 0)):
+        """Start simulating entity from its current position and rotation. Returns its row."""
+        if self.count == len(self.base):
+            self._allocate(len(self.base) * 2)
+        row = self.count
+        self.base[row] = tuple(entity.position)
+        self.position[row] = self.base[row]
+        self.rotation[row] = tuple(entity.rotation)
+        self.velocity[row] = velocity
+        self.spin[row] = spin
+        self.sway[row] = sway
+        self.radius[row] = radius
+        self.entities.append(entity)
+        self.count += 1
+        return row
+
+    def clear(self):
+        self.entities.clear()
+        self.count = 0
+
+    def step(self, dt, t, rng):
+        n = self.count
+        if not n:
+            return
+        base = self.base[:n]
+        base += self.velocity[:n] * dt
+        rotation = self.rotation[:n]
+        rotation += self.spin[:n] * dt
+        np.mod(rotation, 360, out=rotation)
+
+        if self.respawn_low is not None:
+            out = np.any((base < self.bounds_low) | (base > self.bounds_high), axis=1)
+            if out.any():
+                base[out] = rng.uniform(self.respawn_low, self.respawn_high, size=(int(out.sum()), 3))
+
+        np.add(base, self.sway[:n] * np.sin(self.sway_speed * t), out=self.position[:n])
+
+    def push(self):
+        """Write positions and rotations to the scene graph."""
+        n = self.count
+        if not n:
+            return
+        # Ursina rotation (x, y, z) is Panda3D hpr (y, x, z) * rotation_directions.
+        hpr = self.rotation[:n][:, (1, 0, 2)] * Entity.rotation_directions
+        for entity, (x, y, z), (h, p, r) in zip(self.entities, self.position[:n].tolist(), hpr.tolist()):
+            entity.setPosHpr(x, y, z, h, p, r)
+
+
+class HazardSystem:
+    def __init__(self, grid=None, rng=None, tag='hazard'):
+        self.grid = grid
+        self.tag = tag
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.batches = {}
+
+    def seed(self, seed):
+        """Restart the respawn random numbers from seed, e.g. for a replay."""
+        self.rng = np.random.default_rng(seed)
+
+    def add_kind(self, kind, **settings):
+        """Create the batch for one hazard kind; see HazardBatch for settings."""
+        batch = HazardBatch(kind, **settings)
+        self.batches[kind] = batch
+        return batch
+
+    def add(self, kind, entity, radius=0.0, **motion):
+        """Simulate entity as a hazard of the given kind.
+
+        radius is its reach in the collision grid; motion is velocity, spin
+        and sway as (x, y, z) tuples.
+        """
+        batch = self.batches[kind]
+        row = batch.add(entity, radius, **motion)
+        # The system drives this entity, so Ursina's per-entity update loop can skip it.
+        entity.ignore = True
+        if self.grid is not None:
+            self.grid.insert(entity, entity.position, radius, tag=self.tag)
+            batch.spans[row] = self.grid.cell_span(entity.position, radius)
+        return entity
+
+    def clear(self):
+        for batch in self.batches.values():
+            if self.grid is not None:
+                for entity in batch.entities:
+                    self.grid.remove(entity)
+            batch.clear()
+
+    def step(self, dt, t):
+        """Advance all hazards by dt (t is the current sim time) and update their nodes."""
+        for batch in self.batches.values():
+            batch.step(dt, t, self.rng)
+            batch.push()
+            if self.grid is not None:
+                self._sync_grid(batch)
+
+    def _sync_grid(self, batch):
+        # Work out every hazard's cell span at once and only touch the grid
+        # for the ones that crossed a cell boundary.
+        n = batch.count
+        if not n:
+            return
+        xz = batch.position[:n][:, (0, 2)]
+        r = batch.radius[:n, None]
+        spans = np.floor(np.hstack((xz - r, xz + r)) / self.grid.cell_size)
+        for row in np.flatnonzero(np.any(spans != batch.spans[:n], axis=1)).tolist():
+            self.grid.update(batch.entities[row], batch.position[row])
+        batch.spans[:n] = spans
@@ -0,0 +1,149 @@
+"""
+Instanced props: many copies of one model drawn from a single node.
+
+StaticBatch merges geometry that never moves. Props that do move (bob-ombs,
+boulders, chain links) would otherwise each need their own node, and the
+cull/draw cost grows with every copy. An InstancedProps is one entity holding
+the model once, drawn with a hardware instance count. Every copy's transform
+and color live in one float32 array, data[index] = 3 rows of an affine
+transform + RGBA, uploaded as a buffer texture at most once per frame, so
+the GPU reads them per gl_InstanceID.
+
+    links = InstancedProps('sphere', 8, color=color.gray)
+    for _ in range(8):
+        links.add(scale=0.15)
+    links.positions[:] = points   # bulk write; positions is a view into data
+    links.dirty = True
+
+Gameplay entities that still need a collider drop their model and hand their
+transform over with follow(index, entity) after they move.
+"""
+
+import numpy as np
+from panda3d.core import GeomEnums, OmniBoundingVolume, Texture
+from ursina import Entity, Shader, Vec2, application, color as colors
+
+instanced_prop_shader = Shader(name='instanced_prop_shader', language=Shader.GLSL, vertex='''#version 140
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform samplerBuffer instances;
+in vec4 p3d_Vertex;
+in vec2 p3d_MultiTexCoord0;
+in vec4 p3d_Color;
+out vec2 texcoords;
+out vec4 vertex_color;
+uniform vec2 texture_scale;
+uniform vec2 texture_offset;
+
+void main() {
+    int base = gl_InstanceID * 4;
+    vec4 v = vec4(p3d_Vertex.xyz, 1.);
+    vec3 placed = vec3(dot(texelFetch(instances, base), v),
+                       dot(texelFetch(instances, base + 1), v),
+                       dot(texelFetch(instances, base + 2), v));
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(placed, 1.);
+    texcoords = (p3d_MultiTexCoord0 * texture_scale) + texture_offset;
+    vertex_color = p3d_Color * texelFetch(instances, base + 3);
+}
+''',
+fragment='''#version 140
+
+uniform sampler2D p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+in vec2 texcoords;
+in vec4 vertex_color;
+out vec4 fragColor;
+
+void main() {
+    fragColor = texture(p3d_Texture0, texcoords) * p3d_ColorScale * vertex_color;
+}
+''',
+default_input={
+    'texture_scale': Vec2(1, 1),
+    'texture_offset': Vec2(0, 0),
+})
+
+UPLOAD_SORT = 45    # after Ursina's 'update' task (sort 0), before ShowBase renders (50)
+
+
+class InstancedProps(Entity):
+    def __init__(self, model, capacity, color=colors.white, **kwargs):
+        super().__init__(model=model, shader=instanced_prop_shader, **kwargs)
+        self.capacity = capacity
+        self.count = 0
+        self.default_color = color
+        self.data = np.zeros((capacity, 4, 4), np.float32)
+        self.buffer = Texture('instances')
+        self.buffer.setupBufferTexture(capacity * 4, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+        self.set_shader_input('instances', self.buffer)
+        self.setInstanceCount(0)
+        # The node's own bounds only cover one copy at the origin; never cull the lot by it.
+        self.node().setBounds(OmniBoundingVolume())
+        self.node().setFinal(True)
+        self.dirty = True
+        self._upload_task = application.base.taskMgr.add(self._upload, 'instanced-props-upload', sort=UPLOAD_SORT)
+
+    @property
+    def positions(self):
+        """(count, 3) view of every copy's translation, for bulk writes. Set dirty afterwards."""
+        return self.data[:self.count, :3, 3]
+
+    @property
+    def colors(self):
+        """(count, 4) view of every copy's RGBA. Set dirty afterwards."""
+        return self.data[:self.count, 3]
+
+    def add(self, position=(0, 0, 0), scale=1, color=None):
+        """Add a copy and return its index."""
+        if self.count == self.capacity:
+            raise ValueError(f'InstancedProps is full ({self.capacity} copies)')
+        index = self.count
+        self.count += 1
+        self.place(index, position, scale)
+        self.set_color(index, self.default_color if color is None else color)
+        self.setInstanceCount(self.count)
+        return index
+
+    def place(self, index, position, scale=1):
+        """Move copy index to position, unrotated, scaled by a number or (x, y, z)."""
+        if not hasattr(scale, '__len__'):
+            scale = (scale, scale, scale)
+        transform = self.data[index]
+        transform[:3] = 0
+        transform[0, 0], transform[1, 1], transform[2, 2] = scale
+        transform[:3, 3] = tuple(position)[:3]
+        self.dirty = True
+
+    def follow(self, index, entity):
+        """Give copy index the full transform (position, rotation, scale) of entity."""
+        matrix = entity.getMat(self)
+        self.data[index, :3] = (matrix.getCol(0), matrix.getCol(1), matrix.getCol(2))
+        self.dirty = True
+
+    def set_color(self, index, color):
+        self.data[index, 3] = tuple(color)
+        self.dirty = True
+
+    def remove(self, index):
+        """Stop drawing copy index. Indices of other copies don't change."""
+        self.data[index, :3] = 0
+        self.dirty = True
+
+    def clear(self):
+        self.count = 0
+        self.setInstanceCount(0)
+
+    def _upload(self, task):
+        if self.dirty:
+            self.buffer.setRamImage(self.data)
+            self.dirty = False
+        return task.cont
+
+    def on_destroy(self):
+        application.base.taskMgr.remove(self._upload_task)
+
+    @property
+    def geom_count(self):
+        """Draw calls all copies together take (the model's Geoms, not times the copies)."""
+        return sum(path.node().getNumGeoms() for path in self.findAllMatches('**/+GeomNode'))
+
@@ -0,0 +1,156 @@
+"""
+Compiled level cache for the static part of a level.
+
+A level builder is a function build(batch, **params) that creates the
+level's static entities and adds them to a StaticBatch. The first time
+load_level() sees a builder it runs it as usual, then writes the merged
+geometry to a Panda3D BAM file plus a JSON sidecar describing every
+collider and the shader of each merged group. Later launches load those
+two files instead: one BAM read and a handful of collider-only entities,
+with no model loading, batching or flattening.
+
+The cache key hashes the builder's source, its params, the source of
+anything listed in depends (e.g. an Entity subclass the builder creates) and
+the modules that shape the output (this one, staticbatch, collisionproxy),
+so editing any of them just makes the next launch rebuild. Delete
+.levelcache/ to force it.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+from panda3d.core import Filename
+from ursina import Entity, application
+from ursina.collider import BoxCollider, SphereCollider
+from ursina.shader import imported_shaders
+
+import collisionproxy
+import staticbatch
+from staticbatch import StaticBatch
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.levelcache')
+FORMAT_VERSION = 1
+
+
+class Level:
+    """A loaded level: its root entity plus its named collider entities."""
+
+    def __init__(self, root, pieces, from_cache):
+        self.root = root
+        self.pieces = pieces        # entity name -> Entity, for the ones games refer to
+        self.from_cache = from_cache
+
+    def __getitem__(self, name):
+        return self.pieces[name]
+
+
+def cache_key(build, params, depends=()):
+    digest = hashlib.sha1()
+    digest.update(str(FORMAT_VERSION).encode())
+    digest.update(repr(sorted(params.items())).encode())
+    for obj in (build, *depends):
+        digest.update(inspect.getsource(obj).encode())
+    for module in (staticbatch, collisionproxy, inspect.getmodule(cache_key)):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()[:16]
+
+
+def collider_spec(entity):
+    """JSON-friendly description of entity's collider, or None if it has none."""
+    collider = entity.collider
+    if collider is None:
+        return None
+    spec = {
+        'name': entity.name,
+        'position': list(entity.world_position),
+        'rotation': list(entity.world_rotation),
+        'scale': list(entity.world_scale),
+    }
+    if isinstance(collider, BoxCollider):
+        spec.update(shape='box', center=list(collider.center), size=list(collider.size))
+    elif isinstance(collider, SphereCollider):
+        spec.update(shape='sphere', center=list(collider.center), radius=collider.radius)
+    else:
+        # Triangle colliders are rebuilt from the model they came from.
+        spec.update(shape='mesh', model=entity.model.name)
+    return spec
+
+
+def collider_entity(spec, parent):
+    """Recreate a collider-only (invisible) entity from collider_spec() output."""
+    entity = Entity(
+        parent=parent,
+        name=spec['name'],
+        position=spec['position'],
+        rotation=spec['rotation'],
+        scale=spec['scale'],
+    )
+    if spec['shape'] == 'box':
+        entity.collider = BoxCollider(entity, center=spec['center'], size=spec['size'])
+    elif spec['shape'] == 'sphere':
+        entity.collider = SphereCollider(entity, center=spec['center'], radius=spec['radius'])
+    else:
+        entity.model = spec['model']
+        entity.collider = 'mesh'
+        entity.hide()
+    return entity
+
+
+def _paths(name, key):
+    base = os.path.join(CACHE_DIR, f'{name}-{key}')
+    return base + '.bam', base + '.json'
+
+
+def _build(name, build, params, bam_path, meta_path):
+    batch = StaticBatch(name)
+    build(batch, **params)
+    batch.build()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    batch.root.writeBamFile(Filename.fromOsSpecific(bam_path))
+    meta = {
+        'version': FORMAT_VERSION,
+        'groups': [{'name': group.name, 'shader': group.shader.name if group.shader else None}
+                   for group in batch.groups.values()],
+        'colliders': [spec for spec in map(collider_spec, batch.sources) if spec],
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    # Keep the sources (hidden, colliding) under the root so one destroy() clears the level.
+    pieces = {}
+    for entity in batch.sources:
+        entity.parent = batch.root
+        pieces[entity.name] = entity
+    return Level(batch.root, pieces, from_cache=False)
+
+
+def _load(name, bam_path, meta_path):
+    with open(meta_path) as f:
+        meta = json.load(f)
+    model = application.base.loader.loadModel(Filename.fromOsSpecific(bam_path), noCache=True)
+
+    root = Entity(name=name)
+    # Rebuild each group as an Entity so Ursina sets up its shader and inputs,
+    # then move the merged geometry from the BAM under it.
+    for spec, loaded in zip(meta['groups'], model.getChildren()):
+        group = Entity(parent=root, name=spec['name'], shader=imported_shaders.get(spec['shader']))
+        for child in loaded.getChildren():
+            child.reparentTo(group)
+    model.removeNode()
+
+    pieces = {}
+    for spec in meta['colliders']:
+        pieces[spec['name']] = collider_entity(spec, root)
+    return Level(root, pieces, from_cache=True)
+
+
+def load_level(name, build, depends=(), **params):
+    """Load the static level that build(batch, **params) makes, from the cache if it is current."""
+    key = cache_key(build, params, depends)
+    bam_path, meta_path = _paths(name, key)
+    if os.path.exists(bam_path) and os.path.exists(meta_path):
+        return _load(name, bam_path, meta_path)
+    return _build(name, build, params, bam_path, meta_path)
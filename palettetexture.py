@@ -0,0 +1,100 @@
+"""
+Palette-indexed 8-bit textures: one byte per pixel plus a small RGBA palette.
+
+An IndexedTexture holds an (height, width) uint8 index array and an 8-bit
+pygame surface made with pygame.image.frombuffer(..., 'P') over that same
+memory, so drawing indices (e.g. a rasterbatch.PrimitiveBatch(channels=1))
+changes the surface with no copy. Index 0 is transparent through the
+surface's colorkey; the other entries are the named palette colours.
+
+Colour changes never touch the pixels. recolor(), flash() and restore()
+rewrite palette entries and hand them to the surface with set_palette(), so
+they cost O(palette) whatever the texture's size. variant() makes a
+palette-swapped copy, e.g. a differently coloured enemy, that shares the
+index array and only owns its palette. to_rgba() is the one O(pixels)
+conversion, for code that needs 32-bit pixels.
+
+At a byte per pixel instead of four, a texture takes about a quarter of the
+memory of the same RGBA texture.
+"""
+
+import numpy as np
+import pygame
+
+TRANSPARENT = 0
+TRANSPARENT_KEY = (255, 0, 255, 0)   # what index 0 holds; never drawn because of the colorkey
+
+
+class IndexedTexture:
+    """An index array, its palette and the 8-bit surface showing them."""
+
+    def __init__(self, indices, names, palette):
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint8)
+        self.names = list(names)                        # palette entry i + 1 is names[i]
+        self.index_of = {name: i + 1 for i, name in enumerate(self.names)}
+        self.palette = np.asarray(palette, dtype=np.uint8).copy()
+        self.base = self.palette.copy()
+        self.version = 0            # bumped when the indices change; palette changes don't
+        self.palette_version = 0    # bumped when the palette changes
+        height, width = self.indices.shape
+        self.surface = pygame.image.frombuffer(self.indices, (width, height), 'P')
+        self.surface.set_colorkey(TRANSPARENT)
+        self.apply(self.surface)
+
+    @classmethod
+    def blank(cls, size, colors):
+        """An all-transparent texture of size (w, h) with the palette {name: rgba} (at most 255 colours)."""
+        width, height = size
+        names = list(colors)
+        if len(names) > 255:
+            raise ValueError(f"an 8-bit palette holds 255 colours plus transparency, got {len(names)}")
+        palette = [TRANSPARENT_KEY] + [colors[name] for name in names]
+        return cls(np.zeros((height, width), dtype=np.uint8), names, palette)
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.palette.nbytes
+
+    @property
+    def rgba_nbytes(self):
+        return self.indices.size * 4
+
+    def updated(self):
+        """Call after changing indices, so anything cached from the surface is rebuilt."""
+        self.version += 1
+
+    def apply(self, surface):
+        """Give surface (this texture's, or a scaled copy of it) the current palette."""
+        surface.set_palette([tuple(color) for color in self.palette[:, :3].tolist()])
+
+    def _palette_changed(self):
+        self.palette_version += 1
+        self.apply(self.surface)
+
+    def recolor(self, colors):
+        """Change named entries, {name: rgba}, for good (restore() keeps them); the pixels keep their indices."""
+        for name, color in colors.items():
+            self.palette[self.index_of[name]] = self.base[self.index_of[name]] = color
+        self._palette_changed()
+
+    def flash(self, color):
+        """Every visible entry becomes color, e.g. white for a damage flash."""
+        self.palette[1:] = color
+        self._palette_changed()
+
+    def restore(self):
+        """Undo flash(): back to the palette as made or last recolored."""
+        self.palette[:] = self.base
+        self._palette_changed()
+
+    def variant(self, colors):
+        """A palette-swapped texture sharing these indices, with colors {name: rgba} changed."""
+        texture = IndexedTexture(self.indices, self.names, self.base)
+        texture.recolor(colors)
+        return texture
+
+    def to_rgba(self):
+        """(height, width, 4) RGBA pixels, index 0 fully transparent."""
+        rgba = self.palette[self.indices]
+        rgba[self.indices == TRANSPARENT] = 0
+        return rgba
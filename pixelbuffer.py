@@ -0,0 +1,47 @@
+"""
+RGBA pixel buffers shared between NumPy and a pygame surface.
+
+PixelBuffer owns one (height, width, 4) uint8 array, row-major like the
+screen, and a SRCALPHA surface made with pygame.image.frombuffer() over that
+same memory. Drawing into buffer.pixels (draw_rect, draw_circle, a
+rasterbatch.PrimitiveBatch) changes the surface directly: no make_surface()
+copy, no axis transpose and no alpha thrown away.
+
+The buffer counts the bytes each texture update writes: the whole array for
+clear() plus whatever the caller reports to updated(), e.g. the pixels a
+batch draw touched. Together with ScaleCache's rescale bytes that is what a
+texture update really moves.
+"""
+
+import numpy as np
+import pygame
+
+
+class PixelBuffer:
+    """An RGBA array and the surface that views it."""
+
+    def __init__(self, width, height):
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        # The surface reads self.pixels' memory; keeping the array alive keeps the surface valid
+        self.surface = pygame.image.frombuffer(self.pixels, (width, height), 'RGBA')
+        self.version = 0
+        self.updates = 0
+        self.bytes_written = 0
+
+    @property
+    def size(self):
+        return self.surface.get_size()
+
+    def clear(self):
+        self.pixels.fill(0)
+        self.bytes_written += self.pixels.nbytes
+
+    def updated(self, nbytes=0):
+        """Call after changing pixels, with how many bytes were written, so cached copies are rebuilt."""
+        self.version += 1
+        self.updates += 1
+        self.bytes_written += nbytes
+
+    def stats(self):
+        return {'updates': self.updates, 'bytes_written': self.bytes_written,
+                'bytes_per_update': self.bytes_written / max(1, self.updates)}
@@ -0,0 +1,192 @@
+"""
+Frame profiler: named scopes, a ring buffer of recent frames, Chrome trace export.
+
+Game systems mark their work with scopes; each one costs two perf_counter()
+calls and a list append, cheap enough to leave in release builds:
+
+    profiler = Profiler(budget_ms=50)
+
+    @profiler.profiled
+    def animate_hazards(): ...
+
+    with profiler.scope('boss ai'):
+        ...
+
+install(app) adds Panda3D tasks that cut the frame in two: 'ursina update'
+(Ursina's update task: the game's update() and every entity's update()) and
+'cull + draw' (ShowBase's igLoop). Scopes inside a frame nest
+under those by time. The last `frames` frames are kept; dump() writes them
+as Chrome trace JSON (chrome://tracing or ui.perfetto.dev). A dump also
+happens by itself when a frame takes longer than budget_ms, at most once per
+cooldown seconds, so a spike always comes with the frames that led up to it.
+Those dumps snapshot the buffer and write it from a background thread, so
+the slow frame doesn't get slower. Frames that are slow on purpose, like
+building a level, are covered by calling expect_hitch() first.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+from collections import deque
+from time import perf_counter
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.events.append((self.name, self.start, perf_counter() - self.start))
+
+
+class Profiler:
+    def __init__(self, frames=300, budget_ms=50, out_dir=PROFILE_DIR, cooldown=10):
+        self.frames = deque(maxlen=frames)  # (frame number, start, seconds, [(name, start, seconds)])
+        self.budget = budget_ms / 1000
+        self.out_dir = out_dir
+        self.cooldown = cooldown
+        self.events = []
+        self.frame_number = 0
+        self.frame_start = None
+        self.update_done = None
+        self.origin = perf_counter()
+        self.last_dump = -cooldown
+        self.hitch_until = 0    # frames numbered below this don't trigger a dump
+        self.listeners = []     # called with (frame, update, render) seconds after every frame
+        self.pending = None     # (path, frames, reason) jobs for the writer thread, started on the first slow frame
+        self.writer = None
+
+    def scope(self, name):
+        return _Scope(self, name)
+
+    def profiled(self, fn):
+        """Decorator: time every call of fn as a scope named after it."""
+        name = fn.__name__
+
+        def wrapped(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.events.append((name, start, perf_counter() - start))
+        wrapped.__name__ = name
+        wrapped.__doc__ = fn.__doc__
+        return wrapped
+
+    # Frame marks, run as tasks around Ursina's update task (sort 0) and ShowBase's igLoop (sort 50)
+    def _frame_start(self, task):
+        self.frame_start = perf_counter()
+        self.events = []
+        return task.cont
+
+    def _update_done(self, task):
+        self.update_done = perf_counter()
+        return task.cont
+
+    def _render_done(self, task):
+        if self.frame_start is not None:
+            now = perf_counter()
+            update, render = self.update_done - self.frame_start, now - self.update_done
+            self.events.append(('ursina update', self.frame_start, update))
+            self.events.append(('cull + draw', self.update_done, render))
+            self.end_frame(now - self.frame_start)
+            for listener in self.listeners:
+                listener(now - self.frame_start, update, render)
+        return task.cont
+
+    def install(self, app, hotkey='f9'):
+        """Start recording every frame of app; hotkey dumps a trace on demand."""
+        app.taskMgr.add(self._frame_start, 'profiler-frame-start', sort=-1001)
+        app.taskMgr.add(self._update_done, 'profiler-update-done', sort=48)
+        app.taskMgr.add(self._render_done, 'profiler-render-done', sort=52)
+        if hotkey:
+            from ursina import Entity
+
+            def dump_on_key(key):
+                if key == hotkey:
+                    print(f"Profile written to {self.dump('manual')}")
+            Entity(name='profiler_hotkey', input=dump_on_key, ignore_paused=True)
+        return self
+
+    def expect_hitch(self, frames=2):
+        """Don't dump for this frame or the next frames - 1, e.g. around a level load; they are still recorded."""
+        self.hitch_until = max(self.hitch_until, self.frame_number + frames)
+
+    def end_frame(self, seconds):
+        self.frames.append((self.frame_number, self.frame_start, seconds, self.events))
+        self.frame_number += 1
+        now = perf_counter()
+        if seconds > self.budget and now - self.last_dump >= self.cooldown and self.frame_number > self.hitch_until:
+            self.last_dump = now
+            path = self.dump_in_background(f'frame {self.frame_number - 1} took {seconds * 1000:.1f} ms')
+            print(f"Slow frame ({seconds * 1000:.1f} ms), writing profile to {path}")
+
+    def trace(self, frames=None):
+        """The recorded frames (or a snapshot of them) as a Chrome trace dict."""
+        def us(t):
+            return round((t - self.origin) * 1e6, 1)
+
+        events = []
+        for number, start, seconds, scopes in self.frames if frames is None else frames:
+            events.append({'name': f'frame {number}', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': us(start), 'dur': round(seconds * 1e6, 1)})
+            for name, scope_start, scope_seconds in scopes:
+                events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': us(scope_start), 'dur': round(scope_seconds * 1e6, 1)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def _path(self, path):
+        if path is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            path = os.path.join(self.out_dir, f'trace-{self.frame_number}.json')
+        return path
+
+    @staticmethod
+    def _write(path, trace, reason):
+        trace['otherData'] = {'reason': reason}
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+
+    def dump(self, reason='manual', path=None):
+        """Write the ring buffer as trace JSON and return its path."""
+        path = self._path(path)
+        self._write(path, self.trace(), reason)
+        return path
+
+    def dump_in_background(self, reason, path=None):
+        """Snapshot the ring buffer and write it from the writer thread; returns the path it will have."""
+        # Finished frames' event lists are never touched again, so a shallow copy is a stable snapshot
+        frames = list(self.frames)
+        path = self._path(path)
+        if self.writer is None:
+            self.pending = queue.SimpleQueue()
+            self.writer = threading.Thread(target=self._run_writer, name='profiler-writer', daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+        self.pending.put((path, frames, reason))
+        return path
+
+    def _run_writer(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                break
+            path, frames, reason = job
+            self._write(path, self.trace(frames), reason)
+
+    def close(self):
+        """Finish writing queued dumps and stop the writer thread."""
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join()
+            self.writer = None
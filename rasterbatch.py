@@ -0,0 +1,209 @@
+"""
+Batched primitive rasterization into RGBA NumPy pixel arrays.
+
+    batch = PrimitiveBatch()
+    batch.rects(xywh, colors)               # (n, 4) x, y, w, h
+    batch.circles(xyr, colors)              # (n, 3) cx, cy, r, filled discs
+    batch.lines(xyxy, colors)               # (n, 4) x0, y0, x1, y1, one pixel wide
+    batch.triangles(xyxyxy, colors)         # (n, 6) three corners, filled
+    batch.draw(pixels)                      # pixels is (height, width, 4) uint8
+
+colors is one RGBA colour for the whole call or an (n, 4) array. A
+PrimitiveBatch(channels=1) draws palette indices instead: colors is one
+index or an (n,) array, and pixels is (height, width) uint8. Primitives
+are painted in the order they were added, later ones on top, like the same
+sequence of SM64Renderer.draw_rect/draw_circle calls.
+
+Nothing is drawn one primitive at a time. Every kind is expanded into
+fragments (pixel y, pixel x, primitive number) with array arithmetic:
+variable-sized rects, line spans and triangle bounding boxes through one
+repeat/arange, circles from a disc mask cached per radius. The fragments
+are clipped, put in painting order and written with a single fancy-index
+assignment, where the last write to a pixel wins.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def disc_mask(radius):
+    """Boolean (2r+1, 2r+1) mask of a filled disc, cached per radius."""
+    y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    mask = x * x + y * y <= radius * radius
+    mask.flags.writeable = False
+    return mask
+
+
+def _spans(counts):
+    """For n items with counts[i] fragments each: (item of each fragment, its index within the item)."""
+    total = int(counts.sum())
+    items = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+    starts = np.cumsum(counts, dtype=np.int32) - counts
+    return items, np.arange(total, dtype=np.int32) - starts[items]
+
+
+def _colors(colors, n, channels):
+    colors = np.asarray(colors, dtype=np.uint8)
+    shape = (n,) if channels == 1 else (n, channels)
+    return np.broadcast_to(colors, shape) if colors.ndim < len(shape) else colors
+
+
+class PrimitiveBatch:
+    """Primitives queued up for one draw() call."""
+
+    def __init__(self, channels=4):
+        self.channels = channels
+        self.parts = []     # (kind, params (n, k) int array, colours (n, channels)), in painting order
+        self.count = 0
+        self.written = 0    # pixel writes the last draw() made, overdraw included
+
+    def __len__(self):
+        return self.count
+
+    def _add(self, kind, params, colors, width):
+        params = np.asarray(params, dtype=np.int32).reshape(-1, width)
+        self.parts.append((kind, params, _colors(colors, len(params), self.channels)))
+        self.count += len(params)
+        return self
+
+    def rects(self, xywh, colors):
+        return self._add('rect', xywh, colors, 4)
+
+    def circles(self, xyr, colors):
+        return self._add('circle', xyr, colors, 3)
+
+    def lines(self, xyxy, colors):
+        return self._add('line', xyxy, colors, 4)
+
+    def triangles(self, xyxyxy, colors):
+        return self._add('triangle', xyxyxy, colors, 6)
+
+    @classmethod
+    def from_shapes(cls, shapes, palette, channels=4):
+        """A batch from spriteatlas-style shape lists, e.g. ['rect', x, y, w, h, 'skin']."""
+        batch = cls(channels)
+        add = {'rect': batch.rects, 'circle': batch.circles, 'line': batch.lines, 'triangle': batch.triangles}
+        for kind, *args, color in shapes:
+            add[kind](args, palette[color] if isinstance(color, str) else color)
+        return batch
+
+    def draw(self, pixels):
+        """Rasterize every queued primitive into pixels, (height, width, channels) uint8 or (height, width) for 1."""
+        height, width = pixels.shape[:2]
+        flat, order = [], []
+        first = 0
+        for kind, params, _ in self.parts:
+            index, item = _FRAGMENTS[kind](params, width, height)
+            flat.append(index)
+            order.append(item + first)
+            first += len(params)
+        self.written = 0
+        if not first:
+            return pixels
+
+        flat, order = np.concatenate(flat), np.concatenate(order)
+        self.written = len(flat)
+        colors = np.ascontiguousarray(np.concatenate([colors for _, _, colors in self.parts]))
+        if pixels.flags.c_contiguous and pixels.shape[2:] == (4,) and pixels.dtype == np.uint8:
+            # Write each pixel as one 32-bit word instead of four bytes
+            pixels.view(np.uint32).reshape(-1)[flat] = colors.view(np.uint32).reshape(-1)[order]
+        elif pixels.flags.c_contiguous and pixels.ndim == 2:
+            pixels.reshape(-1)[flat] = colors[order]
+        else:
+            pixels[flat // width, flat % width] = colors[order]
+        return pixels
+
+
+def _row_spans(y, x0, x1, items, width, height):
+    """Flat pixel indices of horizontal spans [x0, x1) on rows y, clipped to the canvas, with their items."""
+    x0, x1 = np.maximum(x0, 0), np.minimum(x1, width)
+    keep = (y >= 0) & (y < height) & (x1 > x0)
+    y, x0, x1, items = y[keep], x0[keep], x1[keep], items[keep]
+    rows, local = _spans(x1 - x0)
+    return (y * width + x0)[rows] + local, items[rows]
+
+
+def _rows(top, height):
+    """Expand n primitives into one entry per row: (primitive of each row, row y)."""
+    items, local = _spans(np.maximum(height, 0))
+    return items, top[items] + local
+
+
+def _rect_fragments(params, width, height):
+    x, y, w, h = params.T
+    # Clip rows first so huge rects only cost the pixels that are on the canvas
+    y0 = np.clip(y, 0, height)
+    items, rows = _rows(y0, np.clip(y + h, 0, height) - y0)
+    return _row_spans(rows, x[items], (x + w)[items], items, width, height)
+
+
+@lru_cache(maxsize=None)
+def disc_half_widths(radius):
+    """For each row dy = -r..r of a disc, how far it reaches left and right of the center."""
+    dy = np.arange(-radius, radius + 1)
+    half = np.floor(np.sqrt(radius * radius - dy * dy)).astype(np.int32)
+    half.flags.writeable = False
+    return half
+
+
+def _circle_fragments(params, width, height):
+    cx, cy, r = params.T
+    # A negative radius draws nothing, like draw_circle
+    items, local = _spans(np.maximum(2 * r + 1, 0))
+    # Half-widths of every row come from one table holding each distinct radius's cached rows
+    radii = np.unique(r[r >= 0])
+    offsets = np.zeros(int(radii.max()) + 1 if len(radii) else 1, dtype=np.int32)
+    table = []
+    position = 0
+    for radius in radii.tolist():
+        offsets[radius] = position
+        table.append(disc_half_widths(radius))
+        position += 2 * radius + 1
+    table = np.concatenate(table) if table else np.zeros(0, dtype=np.int32)
+    half = table[offsets[r[items]] + local] if len(items) else local
+    rows = cy[items] - r[items] + local
+    return _row_spans(rows, cx[items] - half, cx[items] + half + 1, items, width, height)
+
+
+def _line_fragments(params, width, height):
+    x0, y0, x1, y1 = params.T
+    steps = np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))
+    items, local = _spans(steps + 1)
+    t = local / np.maximum(steps[items], 1)
+    xs = np.rint(x0[items] + t * (x1 - x0)[items]).astype(np.int32)
+    ys = np.rint(y0[items] + t * (y1 - y0)[items]).astype(np.int32)
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    return (ys * width + xs)[inside], items[inside]
+
+
+def _triangle_fragments(params, width, height):
+    ax, ay, bx, by, cx, cy = params.T
+    top = np.clip(np.minimum(np.minimum(ay, by), cy), 0, height)
+    bottom = np.clip(np.maximum(np.maximum(ay, by), cy) + 1, 0, height)
+    items, ys = _rows(top, bottom - top)
+    lo = np.minimum(np.minimum(ax, bx), cx)[items]
+    hi = np.maximum(np.maximum(ax, bx), cx)[items] + 1
+
+    # A pixel is inside when all three edge functions a*x + b*y + c are >= 0, with the
+    # edges flipped per triangle to its winding. On one row each edge bounds x from one side.
+    winding = np.where((bx - ax) * (cy - ay) - (by - ay) * (cx - ax) < 0, -1, 1).astype(np.int32)
+    for x0, y0, x1, y1 in ((ax, ay, bx, by), (bx, by, cx, cy), (cx, cy, ax, ay)):
+        a, b = -(y1 - y0) * winding, (x1 - x0) * winding
+        c = -(a * x0 + b * y0)
+        a, rest = a[items], b[items] * ys + c[items]     # edge >= 0  <=>  a*x >= -rest
+        right = a > 0
+        left = a < 0
+        lo = np.where(right, np.maximum(lo, -(rest // np.where(right, a, 1))), lo)
+        hi = np.where(left, np.minimum(hi, rest // np.where(left, -a, 1) + 1), hi)
+        hi = np.where((a == 0) & (rest < 0), lo, hi)
+    return _row_spans(ys, lo, hi, items, width, height)
+
+
+_FRAGMENTS = {
+    'rect': _rect_fragments,
+    'circle': _circle_fragments,
+    'line': _line_fragments,
+    'triangle': _triangle_fragments,
+}
@@ -1,5 +1,13 @@
+import sys
 import pygame
 import numpy as np
+from time import perf_counter
+from benchmark import WARMUP_FRAMES, FrameTimer, bench_requested, frames_requested, population
+from spriteatlas import load_atlas
+from rasterbatch import PrimitiveBatch, disc_mask
+from pixelbuffer import PixelBuffer
+from spritebatch import SpriteBatch
+from palettetexture import IndexedTexture
 
 # Initialize Pygame with no sound
 pygame.mixer.pre_init(44100, -16, 2, 512)  # Set up mixer but will be muted
@@ -14,40 +22,137 @@ SCALE = 8  # Scale factor for pixel art
 screen = pygame.display.set_mode(WINDOW_SIZE)
 pygame.display.set_caption("Super Mario 64 Renderer")
 clock = pygame.time.Clock()
+BACKGROUND = (0, 0, 0)
+DIRTY_FLAG = '--dirty'  # present only the changed regions instead of flipping whole frames
+STRESS_FLAG = '--stress'  # ramp up sprite count until frames miss 60 FPS
+INDEXED_FLAG = '--indexed'  # draw Mario from an 8-bit palette-indexed texture
+
+# N64-style color palette (RGBA)
+PALETTE = {
+    'mario_red': [228, 32, 48, 255],
+    'overalls_blue': [32, 96, 255, 255],
+    'skin': [255, 216, 176, 255],
+    'hair': [148, 80, 52, 255],
+    'eyes': [32, 32, 32, 255],
+    'luigi_green': [40, 176, 64, 255],
+    'goomba_brown': [168, 96, 48, 255],
+    'bobomb_black': [24, 24, 32, 255],
+    'fuse': [232, 200, 96, 255],
+    'star_yellow': [255, 224, 32, 255],
+    'white': [255, 255, 255, 255],
+}
+
+def plumber(shirt, overalls):
+    # Body, overalls, head, hat
+    return [['rect', 24, 20, 16, 24, shirt],
+            ['rect', 24, 32, 16, 12, overalls],
+            ['circle', 32, 16, 8, 'skin'],
+            ['rect', 20, 4, 24, 8, 'hair']]
+
+# Every sprite, built into one atlas by spriteatlas.load_atlas()
+SPRITES = {
+    'palette': PALETTE,
+    'sprites': {
+        'mario': {'size': [PIXEL_SIZE, PIXEL_SIZE], 'shapes': plumber('mario_red', 'overalls_blue')},
+        'luigi': {'size': [PIXEL_SIZE, PIXEL_SIZE], 'shapes': plumber('luigi_green', 'overalls_blue')},
+        'goomba': {'size': [32, 32], 'shapes': [['circle', 16, 14, 12, 'goomba_brown'],
+                                                ['rect', 8, 24, 16, 6, 'skin'],
+                                                ['rect', 4, 28, 10, 4, 'eyes'],
+                                                ['rect', 18, 28, 10, 4, 'eyes'],
+                                                ['rect', 10, 10, 4, 6, 'white'],
+                                                ['rect', 18, 10, 4, 6, 'white']]},
+        'bobomb': {'size': [32, 32], 'shapes': [['circle', 16, 18, 12, 'bobomb_black'],
+                                                ['rect', 14, 2, 4, 6, 'fuse'],
+                                                ['rect', 11, 12, 3, 6, 'white'],
+                                                ['rect', 18, 12, 3, 6, 'white'],
+                                                ['rect', 8, 28, 6, 4, 'star_yellow'],
+                                                ['rect', 18, 28, 6, 4, 'star_yellow']]},
+        'star': {'size': [32, 32], 'shapes': [['circle', 16, 16, 9, 'star_yellow'],
+                                              ['rect', 14, 1, 4, 30, 'star_yellow'],
+                                              ['rect', 1, 12, 30, 6, 'star_yellow'],
+                                              ['rect', 12, 12, 2, 6, 'eyes'],
+                                              ['rect', 18, 12, 2, 6, 'eyes']]},
+        'coin': {'size': [16, 16], 'shapes': [['circle', 8, 8, 7, 'star_yellow'],
+                                              ['rect', 7, 3, 2, 10, 'fuse']]},
+    },
+}
+
+class ScaleCache:
+    """Scaled copies of source surfaces, rebuilt only when the source or the target size changes.
+
+    Entries are keyed by (source key, target size) and remember the source
+    version they were scaled from; a newer version replaces them.
+    """
 
-class SM64Renderer:
     def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_scaled = 0
+
+    def get(self, key, version, surface, size):
+        entry = self.entries.get((key, size))
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        # Sizes scaled from an older version are stale now
+        for stale in [k for k, (v, _) in self.entries.items() if k[0] == key and v != version]:
+            del self.entries[stale]
+        scaled = pygame.transform.scale(surface, size)
+        self.bytes_scaled += scaled.get_width() * scaled.get_height() * scaled.get_bytesize()
+        self.entries[(key, size)] = (version, scaled)
+        return scaled
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                'bytes_scaled': self.bytes_scaled}
+
+class SM64Renderer:
+    def __init__(self, cache=None, atlas=None, sprite='mario', indexed=False):
         self.pixel_size = PIXEL_SIZE
-        self.surface = pygame.Surface((self.pixel_size, self.pixel_size), pygame.SRCALPHA)  # Enable alpha channel
+        self.cache = ScaleCache() if cache is None else cache
+        # With an atlas the sprite is blitted straight from it; without, it is drawn here
+        self.atlas = atlas
+        self.sprite = sprite
+        self.offset = (0, 0)  # from the window center, in screen pixels
+        self.buffer = None
+        self.texture = None
+        self.scaled_palette = None  # (scaled surface, palette version) last given to it
+        if atlas is not None:
+            self.surface = atlas.subsurface(sprite)
+            return
+        if indexed:
+            # 8-bit palette indices and an 8-bit surface over the same memory
+            self.texture = IndexedTexture.blank((self.pixel_size, self.pixel_size), PALETTE)
+            self.surface = self.texture.surface
+        else:
+            # RGBA pixels and a SRCALPHA surface over the same memory
+            self.buffer = PixelBuffer(self.pixel_size, self.pixel_size)
+            self.surface = self.buffer.surface
         self.generate_texture()
 
+    @property
+    def texture_version(self):
+        # Bumped whenever self.surface is redrawn
+        if self.texture:
+            return self.texture.version
+        return self.buffer.version if self.buffer else 0
+
     def generate_texture(self):
-        # Create pixel array with alpha channel (3D: height, width, RGBA)
-        pixels = np.zeros((self.pixel_size, self.pixel_size, 4), dtype=np.uint8)
-        
-        # N64-style color palette (RGBA)
-        colors = {
-            'mario_red': [228, 32, 48, 255],
-            'overalls_blue': [32, 96, 255, 255],
-            'skin': [255, 216, 176, 255],
-            'hair': [148, 80, 52, 255],
-            'eyes': [32, 32, 32, 255]
-        }
-
-        # Draw Mario's body
-        self.draw_rect(pixels, 24, 20, 16, 24, colors['mario_red'])
-        # Add overalls
-        self.draw_rect(pixels, 24, 32, 16, 12, colors['overalls_blue'])
-        # Create head
-        self.draw_circle(pixels, 32, 16, 8, colors['skin'])
-        # Add hat
-        self.draw_rect(pixels, 20, 4, 24, 8, colors['hair'])
-
-        # Convert numpy array to Pygame surface (ensure correct RGBA format)
-        # Use make_surface instead of blit_array for better compatibility
-        self.surface = pygame.surfarray.make_surface(pixels[:, :, :3])  # Use RGB channels
-        self.surface = pygame.transform.scale(self.surface, (self.pixel_size, self.pixel_size))  # Ensure size matches
-        self.surface.set_alpha(255)  # Set full opacity
+        # Draw every shape of the sprite in one batched pass, straight into the surface's pixels
+        shapes = SPRITES['sprites'][self.sprite]['shapes']
+        if self.texture:
+            # (height, width) palette indices
+            self.texture.indices.fill(0)
+            self.draw_batch(self.texture.indices, PrimitiveBatch.from_shapes(shapes, self.texture.index_of, channels=1))
+            self.texture.updated()
+            return
+        # (height, width, RGBA)
+        self.buffer.clear()
+        batch = PrimitiveBatch.from_shapes(shapes, PALETTE)
+        self.draw_batch(self.buffer.pixels, batch)
+        self.buffer.updated(batch.written * 4)
 
     def draw_rect(self, pixels, x, y, w, h, color):
         # Ensure bounds are within the pixel array
@@ -58,8 +163,7 @@ class SM64Renderer:
         pixels[y_start:y_end, x_start:x_end] = color
 
     def draw_circle(self, pixels, cx, cy, r, color):
-        y, x = np.ogrid[-r:r+1, -r:r+1]
-        mask = x*x + y*y <= r*r
+        mask = disc_mask(r)  # cached per radius
         # Ensure circle stays within bounds
         y_start = max(cy - r, 0)
         y_end = min(cy + r + 1, self.pixel_size)
@@ -67,35 +171,321 @@ class SM64Renderer:
         x_end = min(cx + r + 1, self.pixel_size)
         pixels[y_start:y_end, x_start:x_end][mask[:y_end-y_start, :x_end-x_start]] = color
 
+    def draw_batch(self, pixels, batch):
+        # Rects, circles, lines and triangles from a rasterbatch.PrimitiveBatch, all in vectorized passes
+        return batch.draw(pixels)
+
+    def placement(self, screen):
+        # Scale up the pixel art (shrinking it if the window is too small) and center it
+        width, height = screen.get_size()
+        scale = max(1, min(SCALE, width // self.pixel_size, height // self.pixel_size))
+        size = self.pixel_size * scale
+        return pygame.Rect((width - size) // 2 + self.offset[0], (height - size) // 2 + self.offset[1], size, size)
+
+    def draw_state(self, screen):
+        # Everything that decides what render() puts on screen; DirtyRectPresenter redraws when it changes
+        if self.texture:
+            return self.placement(screen), (id(self), self.texture_version, self.texture.palette_version)
+        if self.atlas is None:
+            return self.placement(screen), (id(self), self.texture_version)
+        return self.placement(screen), (id(self.atlas), self.sprite, self.atlas.version)
+
     def render(self, screen):
-        # Scale up the pixel art and center it
-        scaled_surface = pygame.transform.scale(self.surface, (self.pixel_size * SCALE, self.pixel_size * SCALE))
-        screen.blit(scaled_surface, ((WINDOW_SIZE[0] - self.pixel_size * SCALE) // 2, 
-                                    (WINDOW_SIZE[1] - self.pixel_size * SCALE) // 2))
+        rect = self.placement(screen)
+        if self.atlas is None:
+            scaled_surface = self.cache.get(id(self), self.texture_version, self.surface, rect.size)
+        else:
+            scaled_surface = self.cache.get((id(self.atlas), self.sprite), self.atlas.version, self.surface, rect.size)
+        if self.texture and self.scaled_palette != (scaled_surface, self.texture.palette_version):
+            # Palette swaps reach the scaled copy as a new palette, without rescaling it
+            self.texture.apply(scaled_surface)
+            self.scaled_palette = (scaled_surface, self.texture.palette_version)
+        screen.blit(scaled_surface, rect)
+
+class FullFramePresenter:
+    """Clears, redraws and flips the whole window every frame."""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.frames = 0
+        self.pixels_pushed = 0
+        self.last_pixels = 0
+
+    def invalidate(self):
+        pass
+
+    def present(self, drawables):
+        self.screen.fill(BACKGROUND)
+        for drawable in drawables:
+            drawable.render(self.screen)
+        pygame.display.flip()
+        self._count(self.screen.get_width() * self.screen.get_height())
+
+    def _count(self, pixels):
+        self.frames += 1
+        self.last_pixels = pixels
+        self.pixels_pushed += pixels
+
+    def stats(self):
+        return {'frames': self.frames, 'pixels_pushed': self.pixels_pushed,
+                'pixels_per_frame': self.pixels_pushed / max(1, self.frames)}
+
+class DirtyRectPresenter(FullFramePresenter):
+    """Clears, redraws and presents only the regions whose drawables changed.
+
+    Each drawable has draw_state(screen) -> (screen rect, anything else that
+    changes its pixels) and render(screen). When a state differs from last
+    frame, its old and new rects are cleared, every drawable touching them is
+    redrawn clipped to them, and only those rects go to display.update().
+    A frame where nothing changed presents nothing.
+    """
+
+    def __init__(self, screen):
+        super().__init__(screen)
+        self.last = {}
+        self.idle_frames = 0
+        self.full = True  # the first frame, or after the window was exposed, repaints everything
+
+    def invalidate(self):
+        self.full = True
+
+    def present(self, drawables):
+        states = {drawable: drawable.draw_state(self.screen) for drawable in drawables}
+        if self.full:
+            dirty = [self.screen.get_rect()]
+            self.full = False
+        else:
+            dirty = []
+            for drawable, state in states.items():
+                previous = self.last.get(drawable)
+                if previous != state:
+                    dirty.append(state[0])
+                    if previous is not None:
+                        dirty.append(previous[0])
+            dirty += [state[0] for drawable, state in self.last.items() if drawable not in states]
+            dirty = merge_rects(rect.clip(self.screen.get_rect()) for rect in dirty)
+        self.last = states
+
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.screen.fill(BACKGROUND, rect)
+            for drawable, state in states.items():
+                if state[0].colliderect(rect):
+                    drawable.render(self.screen)
+        self.screen.set_clip(None)
+        if dirty:
+            pygame.display.update(dirty)
+        else:
+            self.idle_frames += 1
+        self._count(sum(rect.width * rect.height for rect in dirty))
+
+    def stats(self):
+        return dict(super().stats(), idle_frames=self.idle_frames)
+
+def merge_rects(rects):
+    # Union overlapping rects so no pixel is cleared or pushed twice in one frame
+    merged = []
+    for rect in rects:
+        if not rect.width or not rect.height:
+            continue
+        rect = pygame.Rect(rect)
+        touching = [other for other in merged if other.colliderect(rect)]
+        while touching:
+            for other in touching:
+                merged.remove(other)
+            rect = rect.unionall(touching)
+            touching = [other for other in merged if other.colliderect(rect)]
+        merged.append(rect)
+    return merged
+
+def make_presenter(screen, argv=None):
+    dirty = DIRTY_FLAG in (sys.argv if argv is None else argv)
+    return DirtyRectPresenter(screen) if dirty else FullFramePresenter(screen)
+
+def load_sprites():
+    started = perf_counter()
+    atlas = load_atlas(SPRITES)
+    source = 'cache' if atlas.from_cache else 'definitions'
+    print(f"Sprite atlas: {len(atlas)} sprites from {source} in {(perf_counter() - started) * 1000:.1f} ms")
+    return atlas
+
+FLASH_FRAMES = 6
 
 def main():
-    renderer = SM64Renderer()
+    indexed = INDEXED_FLAG in sys.argv
+    renderer = SM64Renderer(indexed=True) if indexed else SM64Renderer(atlas=load_sprites())
+    presenter = make_presenter(screen)
+    flash_frames = 0
     running = True
 
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.WINDOWEXPOSED:
+                presenter.invalidate()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
+                elif indexed and event.key == pygame.K_l:
+                    # Palette swap: Luigi's shirt is just a different palette entry
+                    shirt = renderer.texture.base[renderer.texture.index_of['mario_red']]
+                    luigi = (shirt == PALETTE['mario_red']).all()
+                    renderer.texture.recolor({'mario_red': PALETTE['luigi_green' if luigi else 'mario_red']})
+                elif indexed and event.key == pygame.K_SPACE:
+                    renderer.texture.flash(PALETTE['white'])
+                    flash_frames = FLASH_FRAMES
 
-        # Clear screen
-        screen.fill((0, 0, 0))  # Black background
-        
-        # Render Mario
-        renderer.render(screen)
-        
-        # Update display
-        pygame.display.flip()
+        if flash_frames:
+            flash_frames -= 1
+            if not flash_frames:
+                renderer.texture.restore()
+
+        # Arrow keys nudge Mario around
+        keys = pygame.key.get_pressed()
+        dx = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * 4
+        dy = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * 4
+        renderer.offset = (renderer.offset[0] + dx, renderer.offset[1] + dy)
+
+        # Clear, render Mario and update the display
+        presenter.present([renderer])
+        pygame.display.set_caption(f"Super Mario 64 Renderer - {presenter.last_pixels} px pushed")
         clock.tick(60)  # 60 FPS
 
+    print(f"Scale cache: {renderer.cache.hits} hits, {renderer.cache.misses} misses")
+    print(f"Presented {presenter.stats()}")
+    pygame.quit()
+
+def primitive_scene(count, size=PIXEL_SIZE * SCALE, seed=0):
+    # count each of random small rects, circles, lines and triangles, for timing the batched rasterizer
+    rng = np.random.default_rng(seed)
+    colors = lambda: rng.integers(0, 256, (count, 4))
+    corners = lambda: rng.integers(0, size, (count, 2))
+    batch = PrimitiveBatch()
+    batch.rects(np.c_[corners(), rng.integers(1, 12, (count, 2))], colors())
+    batch.circles(np.c_[corners(), rng.integers(1, 8, count)], colors())
+    start = corners()
+    batch.lines(np.c_[start, start + rng.integers(-16, 16, (count, 2))], colors())
+    start = corners()
+    batch.triangles(np.c_[start, np.tile(start, 2) + rng.integers(-8, 8, (count, 4))], colors())
+    return batch
+
+TEXTURE_UPDATES = 100
+
+def bench(frames):
+    """Time the render loop without the 60 FPS cap, for benchmark.py."""
+    renderer = SM64Renderer(atlas=load_sprites())
+    sprites = population('sprites', 1)
+    batch = primitive_scene(population('primitives', 5000))
+    canvas = np.zeros((PIXEL_SIZE * SCALE, PIXEL_SIZE * SCALE, 4), dtype=np.uint8)
+    started = perf_counter()
+    renderer.draw_batch(canvas, batch)
+    primitive_ms = (perf_counter() - started) * 1000
+
+    # Runtime texture regeneration, drawn straight into its surface and rescaled for the screen
+    drawn = SM64Renderer()
+    drawn.render(screen)
+    before = drawn.buffer.bytes_written + drawn.cache.bytes_scaled
+    started = perf_counter()
+    for _ in range(TEXTURE_UPDATES):
+        drawn.generate_texture()
+        drawn.render(screen)
+    texture_update_ms = (perf_counter() - started) * 1000 / TEXTURE_UPDATES
+    texture_update_bytes = (drawn.buffer.bytes_written + drawn.cache.bytes_scaled - before) / TEXTURE_UPDATES
+
+    # Palette swaps on the 8-bit texture, against recolouring the RGBA one
+    indexed = SM64Renderer(indexed=True).texture
+    started = perf_counter()
+    for _ in range(TEXTURE_UPDATES):
+        indexed.flash(PALETTE['white'])
+        indexed.restore()
+    palette_swap_us = (perf_counter() - started) * 1e6 / (2 * TEXTURE_UPDATES)
+    rgba = drawn.buffer.pixels
+    red = (rgba == PALETTE['mario_red']).all(axis=2)
+    started = perf_counter()
+    for _ in range(TEXTURE_UPDATES):
+        rgba[red] = PALETTE['luigi_green']
+    rgba_recolor_us = (perf_counter() - started) * 1e6 / TEXTURE_UPDATES
+    # Distinct renderers, each its own sprite and spot, so every one is real drawing work
+    atlas = renderer.atlas
+    names = sorted(atlas.rects)
+    rng = np.random.default_rng(0)
+    spread = np.array(WINDOW_SIZE) // 2
+    drawables = [renderer]
+    for i in range(1, sprites):
+        drawable = SM64Renderer(cache=renderer.cache, atlas=atlas, sprite=names[i % len(names)])
+        drawable.offset = tuple(rng.integers(-spread, spread).tolist())
+        drawables.append(drawable)
+    presenter = make_presenter(screen)
+    timer = FrameTimer()
+
+    for frame in range(WARMUP_FRAMES + frames):
+        start = perf_counter()
+        pygame.event.pump()
+        updated = perf_counter()
+
+        presenter.present(drawables)
+
+        if frame >= WARMUP_FRAMES:
+            timer.add(updated - start, perf_counter() - updated)
+
+    timer.report(scene='renderfx.py', entities=sprites, scale_cache=renderer.cache.stats(),
+                 presented=presenter.stats(), primitives=len(batch), primitive_ms=primitive_ms,
+                 texture_update_ms=texture_update_ms, texture_buffer=drawn.buffer.stats(),
+                 texture_rescale=drawn.cache.stats(), texture_update_bytes=texture_update_bytes,
+                 indexed_bytes=indexed.nbytes, rgba_bytes=indexed.rgba_nbytes,
+                 palette_swap_us=palette_swap_us, rgba_recolor_us=rgba_recolor_us)
+    pygame.quit()
+
+STRESS_START = 256
+STRESS_MAX = 1 << 20
+STRESS_FRAMES = 60
+
+def stress_window(batch, frames=STRESS_FRAMES):
+    # p95 frame time of moving, drawing and flipping the batch; None if the window was closed
+    times = []
+    for _ in range(frames):
+        start = perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return None
+        batch.update(1 / 60, WINDOW_SIZE)
+        screen.fill(BACKGROUND)
+        batch.draw(screen)
+        pygame.display.flip()
+        times.append(perf_counter() - start)
+    return sorted(times)[int(len(times) * 0.95) - 1]
+
+def stress():
+    """Double the sprite count until a frame misses 60 FPS, then bisect to the highest count that doesn't."""
+    batch = SpriteBatch(load_sprites())
+    rng = np.random.default_rng(0)
+    good, bad = 0, None
+    count = STRESS_START
+    while count <= STRESS_MAX:
+        batch.resize(count, WINDOW_SIZE, rng)
+        frame_time = stress_window(batch)
+        if frame_time is None:
+            break
+        print(f"{count} sprites: {frame_time * 1000:.2f} ms p95")
+        if frame_time <= 1 / 60:
+            good = count
+        else:
+            bad = count
+        if bad is None:
+            count *= 2
+        elif bad - good <= max(good // 20, 1):  # within 5%
+            break
+        else:
+            count = (good + bad) // 2
+    print(f"Sustainable at 60 FPS: {good} sprites")
     pygame.quit()
+    return good
 
 if __name__ == "__main__":
-    main()
+    if bench_requested():
+        bench(frames_requested())
+    elif STRESS_FLAG in sys.argv:
+        stress()
+    else:
+        main()
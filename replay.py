@@ -0,0 +1,165 @@
+"""
+Input and RNG record/replay, so a play session can be run again exactly.
+
+    python KoopaEngineM1.py --record run.replay     # play, quit; the session is saved
+    python KoopaEngineM1.py --replay run.replay     # plays it back, then exits
+    python benchmark.py --scenes KoopaEngineM1.py --replay run.replay
+
+The game wraps its round start with round_start(). A session begins at the
+first round start and covers every frame until the game exits. It holds:
+
+    seed    the game's random generators are seeded with it at the start
+    dt      the fixed timestep every frame advances by, while recording too
+    keys    [frame, key] for every key/mouse-button event, as Ursina named it
+    mouse   [frame, dx, dy] for every frame the mouse moved
+
+stored as gzipped JSON. On replay the keys are fed back through app.input()
+and mouse.velocity comes from the file instead of the real mouse, on the
+same frames. The game sees the same input and the same random numbers on the
+same simulated clock, which restarts at 0 on frame 0, so it does exactly
+what it did the first time. While recording, the fixed dt is paced to the
+wall clock so the game plays at normal speed; replays run flat out. The
+benchmark uses the same fixed timestep, so replayed bench runs of two builds
+compare them on identical gameplay.
+
+The round start is moved to the top of the next frame, so it lands on the
+same spot of frame 0 whether it came from a click on Start or from a replay.
+The simulated clock is reset to 0 just before the start function runs, so
+any sim_time() stamp the game kept from before then (last hit, cooldowns,
+timers) is stale. The start function must reset every such stamp itself,
+e.g. last_hit_time = -INVULN_DURATION, rather than rely on module-level
+values.
+Mouse position isn't recorded, so menus clicked during the session won't
+replay; keys (pause, jump) do.
+"""
+
+import atexit
+import gzip
+import json
+import random
+import sys
+from time import perf_counter
+
+from headless import FIXED_DT, reset_sim_time, use_fixed_clock
+
+RECORD_FLAG = '--record'
+REPLAY_FLAG = '--replay'
+FORMAT_VERSION = 1
+FRAME_SORT = -45    # after ShowBase's dataLoop (-50) reads real input, before events and Ursina's update (0)
+
+
+class ReplaySession:
+    """What the game talks to; does nothing unless --record or --replay was given.
+
+    reseed(seed) must seed every random generator the game uses.
+    """
+
+    def __init__(self, app, reseed=random.seed, argv=None):
+        argv = sys.argv if argv is None else argv
+        self.app = app
+        self.reseed = reseed
+        self.path = self.mode = None
+        for flag, mode in ((RECORD_FLAG, 'record'), (REPLAY_FLAG, 'replay')):
+            if flag in argv:
+                self.path, self.mode = argv[argv.index(flag) + 1], mode
+        self.frame = -1         # frame 0 is the one the round starts in
+        self.begun = False
+        self.pending_start = None
+        self.session = None
+        if self.mode == 'replay':
+            with gzip.open(self.path, 'rt') as f:
+                self.session = json.load(f)
+            if self.session.get('version') != FORMAT_VERSION:
+                raise ValueError(f"{self.path}: replay format {self.session.get('version')}, expected {FORMAT_VERSION}")
+            self.keys = {}
+            for frame, key in self.session['keys']:
+                self.keys.setdefault(frame, []).append(key)
+            self.mouse = {frame: (dx, dy) for frame, dx, dy in self.session['mouse']}
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def round_start(self, start):
+        """Decorator for the game's start function; the first call begins the session.
+
+        sim_time() is 0 when start runs, so start must reset every sim_time() stamp it keeps.
+        """
+        def wrapped(*args):
+            if self.mode is None or self.begun:
+                return start(*args)
+            self.begun = True
+            self._begin(lambda: start(*args))
+        wrapped.__name__ = start.__name__
+        wrapped.__doc__ = start.__doc__
+        return wrapped
+
+    def _begin(self, start):
+        from ursina import application, mouse
+
+        if not self.replaying:
+            self.session = {'version': FORMAT_VERSION, 'script': sys.argv[0], 'dt': FIXED_DT,
+                            'seed': random.SystemRandom().randrange(2 ** 32), 'frames': 0, 'keys': [], 'mouse': []}
+            self._listen_for_keys()
+            atexit.register(self.save)
+        # Recording is someone playing, so keep the fixed dt but pace it to the wall clock
+        use_fixed_clock(self.session['dt'], real_time=not self.replaying)
+        self.pending_start = start
+
+        real_update = mouse.update
+
+        def mouse_update():
+            real_update()
+            if self.frame < 0:
+                return
+            if self.replaying:
+                dx, dy = self.mouse.get(self.frame, (0, 0))
+                mouse.velocity = type(mouse.velocity)(dx, dy, 0)
+            elif mouse.velocity[0] or mouse.velocity[1]:
+                self.session['mouse'].append([self.frame, round(mouse.velocity[0], 6), round(mouse.velocity[1], 6)])
+        mouse.update = mouse_update
+        application.base.taskMgr.add(self._frame_task, 'replay-frame', sort=FRAME_SORT)
+
+    def _listen_for_keys(self):
+        from ursina import Entity
+
+        def record_key(key):
+            if self.frame >= 0:
+                self.session['keys'].append([self.frame, key])
+        # Sees every input after the game has, with names already translated by Ursina
+        Entity(name='replay_recorder', input=record_key, ignore_paused=True)
+
+    def _frame_task(self, task):
+        if self.pending_start:
+            start, self.pending_start = self.pending_start, None
+            self.reseed(self.session['seed'])
+            # Before start(), so the timers start() resets are stamped on the restarted clock
+            reset_sim_time()
+            self.frame = 0
+            start()
+        else:
+            self.frame += 1
+        if self.replaying:
+            for key in self.keys.get(self.frame, ()):
+                # is_raw: letter keys only reach Ursina's input() through the raw events
+                self.app.input(key, is_raw=True)
+        else:
+            self.session['frames'] = self.frame + 1
+        return task.cont
+
+    def save(self):
+        if self.mode != 'record' or self.session is None:
+            return
+        with gzip.open(self.path, 'wt') as f:
+            json.dump(self.session, f, separators=(',', ':'))
+        print(f"Recorded {self.session['frames']} frames to {self.path}")
+
+    def run(self, start):
+        """Replay mode's main loop: start the round, step through every recorded frame, report."""
+        began = perf_counter()
+        start()
+        while self.frame + 1 < self.session['frames']:
+            self.app.step()
+        elapsed = perf_counter() - began
+        frames = self.session['frames']
+        print(f"Replayed {frames} frames ({frames * self.session['dt']:.1f}s simulated) in {elapsed:.2f}s")
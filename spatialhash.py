@@ -0,0 +1,94 @@
+"""
+Uniform-grid spatial hash for broadphase collision checks.
+
+Things register with a position (anything indexable as x, y, z, e.g. Vec3)
+and a radius, and are bucketed into every grid cell their circle overlaps on
+the XZ plane. query() only looks at the cells around the query circle, so
+the cost of a collision check depends on how crowded that spot is rather
+than on how many things exist in the level. Candidates still need an exact
+distance test afterwards.
+"""
+
+import math
+
+
+class SpatialHash:
+    def __init__(self, cell_size=4.0):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cz) -> {obj: None}, dicts keep insertion order
+        self.entries = {}    # obj -> (cell span, radius, tag)
+        self.queries = 0     # running count of query() calls, for telemetry
+
+    def cell_span(self, position, radius):
+        """Inclusive (x0, z0, x1, z1) range of cells a circle overlaps."""
+        size = self.cell_size
+        return (
+            math.floor((position[0] - radius) / size),
+            math.floor((position[2] - radius) / size),
+            math.floor((position[0] + radius) / size),
+            math.floor((position[2] + radius) / size),
+        )
+
+    def _add_to_cells(self, obj, span):
+        x0, z0, x1, z1 = span
+        for cx in range(x0, x1 + 1):
+            for cz in range(z0, z1 + 1):
+                self.cells.setdefault((cx, cz), {})[obj] = None
+
+    def _remove_from_cells(self, obj, span):
+        x0, z0, x1, z1 = span
+        for cx in range(x0, x1 + 1):
+            for cz in range(z0, z1 + 1):
+                cell = self.cells.get((cx, cz))
+                if cell is None:
+                    continue
+                cell.pop(obj, None)
+                if not cell:
+                    del self.cells[(cx, cz)]
+
+    def insert(self, obj, position, radius=0.0, tag=None):
+        """Register obj, or re-register it if it is already in the grid."""
+        if obj in self.entries:
+            self.remove(obj)
+        span = self.cell_span(position, radius)
+        self._add_to_cells(obj, span)
+        self.entries[obj] = (span, radius, tag)
+
+    def update(self, obj, position, radius=None):
+        """Tell the grid obj moved. Cheap when it stays within the same cells."""
+        old_span, old_radius, tag = self.entries[obj]
+        radius = old_radius if radius is None else radius
+        span = self.cell_span(position, radius)
+        if span != old_span:
+            self._remove_from_cells(obj, old_span)
+            self._add_to_cells(obj, span)
+        self.entries[obj] = (span, radius, tag)
+
+    def remove(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry:
+            self._remove_from_cells(obj, entry[0])
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def query(self, position, radius=0.0, tag=None):
+        """Things whose cells overlap the circle around position, optionally only those with tag."""
+        self.queries += 1
+        x0, z0, x1, z1 = self.cell_span(position, radius)
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cz in range(z0, z1 + 1):
+                cell = self.cells.get((cx, cz))
+                if cell:
+                    found.update(cell)
+        if tag is not None:
+            return [obj for obj in found if self.entries[obj][2] == tag]
+        return list(found)
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def __len__(self):
+        return len(self.entries)
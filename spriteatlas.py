@@ -0,0 +1,126 @@
+"""
+Procedural sprite atlas: many sprites from shape lists, packed into one texture.
+
+A sprite set is a JSON-friendly dict:
+
+    {'palette': {'skin': [255, 216, 176, 255], ...},
+     'sprites': {'mario': {'size': [64, 64],
+                           'shapes': [['rect', x, y, w, h, 'mario_red'],
+                                      ['circle', cx, cy, r, 'skin'], ...]}}}
+
+Shapes are rect, circle, line or triangle, painted in order with later ones
+on top; colours are palette names or RGBA lists. Each sprite is rasterized
+by rasterbatch.PrimitiveBatch, the same rasterizer SM64Renderer uses, so
+atlas sprites and generate_texture() can't drift apart. Sprites are
+shelf-packed into a single RGBA atlas and looked up by name as sub-rects of
+it.
+
+load_atlas() keys the result by a hash of the sprite set and of the modules
+that rasterize it, and keeps it in .spritecache/ as one .npz file, so later
+launches read that file instead of rasterizing. Delete .spritecache/ to
+force a rebuild.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import pygame
+
+import rasterbatch
+from rasterbatch import PrimitiveBatch
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.spritecache')
+FORMAT_VERSION = 1
+ATLAS_WIDTH = 256
+PADDING = 1     # transparent gap between sprites, so scaling doesn't bleed neighbours in
+
+
+class SpriteAtlas:
+    """One RGBA surface holding every sprite, plus name -> pygame.Rect."""
+
+    def __init__(self, pixels, rects, from_cache):
+        self.pixels = pixels    # (height, width, 4) uint8, row-major like the surface
+        self.rects = rects
+        self.from_cache = from_cache
+        self.version = 1        # bump whenever the surface changes, to invalidate scaled copies
+        self.surface = _surface(pixels)
+
+    def __contains__(self, name):
+        return name in self.rects
+
+    def __len__(self):
+        return len(self.rects)
+
+    def rect(self, name):
+        return self.rects[name]
+
+    def subsurface(self, name):
+        """The sprite as a view into the atlas surface, without copying pixels."""
+        return self.surface.subsurface(self.rects[name])
+
+    def blit(self, target, name, position):
+        target.blit(self.surface, position, self.rects[name])
+
+
+def _surface(pixels):
+    height, width = pixels.shape[:2]
+    surface = pygame.image.frombuffer(pixels, (width, height), 'RGBA')
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert_alpha()   # the display's pixel format blits fastest
+    return surface
+
+
+def sprite_key(sprites):
+    digest = hashlib.sha1()
+    digest.update(str(FORMAT_VERSION).encode())
+    digest.update(json.dumps(sprites, sort_keys=True).encode())
+    for module in (rasterbatch, inspect.getmodule(sprite_key)):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()[:16]
+
+
+def pack(sizes, width=ATLAS_WIDTH):
+    """Shelf-pack {name: (w, h)}; returns ({name: (x, y, w, h)}, atlas width, atlas height)."""
+    width = max([width] + [w + PADDING for w, _ in sizes.values()])
+    placed = {}
+    x = y = shelf = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        placed[name] = (x, y, w, h)
+        x += w + PADDING
+        shelf = max(shelf, h + PADDING)
+    return placed, width, y + shelf
+
+
+def build_atlas(sprites):
+    """Rasterize and pack a sprite set; returns (pixels, {name: (x, y, w, h)})."""
+    palette = sprites.get('palette', {})
+    definitions = sprites['sprites']
+    placed, width, height = pack({name: tuple(d['size']) for name, d in definitions.items()})
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    for name, (x, y, w, h) in placed.items():
+        # Draw into the sprite's own cell, so shapes are clipped to it
+        PrimitiveBatch.from_shapes(definitions[name]['shapes'], palette).draw(pixels[y:y + h, x:x + w])
+    return pixels, placed
+
+
+def load_atlas(sprites):
+    """The atlas for a sprite set, from .spritecache/ if this exact set was built before."""
+    path = os.path.join(CACHE_DIR, f'atlas-{sprite_key(sprites)}.npz')
+    if os.path.exists(path):
+        with np.load(path) as data:
+            pixels = data['pixels']
+            placed = dict(zip(data['names'].tolist(), data['rects'].tolist()))
+        from_cache = True
+    else:
+        pixels, placed = build_atlas(sprites)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        names = sorted(placed)
+        np.savez(path, pixels=pixels, names=np.array(names), rects=np.array([placed[n] for n in names]))
+        from_cache = False
+    rects = {name: pygame.Rect(rect) for name, rect in placed.items()}
+    return SpriteAtlas(pixels, rects, from_cache)
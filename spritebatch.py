@@ -0,0 +1,93 @@
+"""
+Many positioned, scaled sprite instances from one atlas, drawn with a single Surface.blits().
+
+Per-sprite state lives in NumPy arrays, one row per instance:
+
+    positions   (n, 2) float32, top-left corner in screen pixels
+    velocities  (n, 2) float32, pixels per second
+    frames      (n,)   int16, index into the batch's sprite names
+    buckets     (n,)   int8, index into SCALE_BUCKETS
+
+Scaling is done once, not per sprite: for every scale bucket the whole atlas
+is scaled up a single time and each (frame, bucket) gets its source rect in
+that scaled copy. Drawing a frame is then one list of (surface, position,
+area) built from the arrays and one screen.blits() call. The scaled atlases
+are RLE-accelerated, which suits procedural sprites whose alpha is all 0 or
+255.
+"""
+
+import numpy as np
+import pygame
+
+SCALE_BUCKETS = (1, 2, 4)
+
+
+class SpriteBatch:
+    """Instances of an atlas's sprites; see the module docstring for the arrays."""
+
+    def __init__(self, atlas, names=None, buckets=SCALE_BUCKETS):
+        self.atlas = atlas
+        self.names = sorted(atlas.rects) if names is None else list(names)
+        self.scales = tuple(buckets)
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        self.frames = np.zeros(0, dtype=np.int16)
+        self.buckets = np.zeros(0, dtype=np.int8)
+        self.atlas_version = None
+        self._build_sources()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _build_sources(self):
+        # One scaled atlas per bucket; source frame * len(scales) + bucket is (surface, area rect)
+        self.sources = []
+        self.sizes = np.zeros((len(self.names), len(self.scales), 2), dtype=np.float32)
+        width, height = self.atlas.surface.get_size()
+        scaled = [pygame.transform.scale(self.atlas.surface, (width * scale, height * scale)) for scale in self.scales]
+        for surface in scaled:
+            # Run-length encode: skips transparent runs and copies opaque ones instead of alpha-blending each pixel
+            surface.set_alpha(255, pygame.RLEACCEL)
+        for frame, name in enumerate(self.names):
+            rect = self.atlas.rect(name)
+            for bucket, scale in enumerate(self.scales):
+                area = pygame.Rect(rect.x * scale, rect.y * scale, rect.width * scale, rect.height * scale)
+                self.sources.append((scaled[bucket], area))
+                self.sizes[frame, bucket] = area.size
+        self.atlas_version = self.atlas.version
+
+    def spawn(self, count, bounds, rng, speed=120):
+        """Add count instances at random positions inside bounds (w, h), moving in random directions."""
+        angle = rng.uniform(0, 2 * np.pi, count)
+        velocity = np.stack([np.cos(angle), np.sin(angle)], axis=1) * rng.uniform(0.25, 1, (count, 1)) * speed
+        self.positions = np.concatenate([self.positions, rng.uniform((0, 0), bounds, (count, 2)).astype(np.float32)])
+        self.velocities = np.concatenate([self.velocities, velocity.astype(np.float32)])
+        self.frames = np.concatenate([self.frames, rng.integers(0, len(self.names), count).astype(np.int16)])
+        self.buckets = np.concatenate([self.buckets, rng.integers(0, len(self.scales), count).astype(np.int8)])
+
+    def resize(self, count, bounds, rng):
+        """Grow with spawn() or drop instances from the end, to exactly count."""
+        if count > len(self):
+            self.spawn(count - len(self), bounds, rng)
+        else:
+            self.positions = self.positions[:count]
+            self.velocities = self.velocities[:count]
+            self.frames = self.frames[:count]
+            self.buckets = self.buckets[:count]
+
+    def update(self, dt, bounds):
+        """Move every instance and bounce it off the edges of bounds (w, h)."""
+        self.positions += self.velocities * dt
+        limit = np.asarray(bounds, dtype=np.float32) - self.sizes[self.frames, self.buckets]
+        out = (self.positions < 0) | (self.positions > limit)
+        self.velocities[out] *= -1
+        np.clip(self.positions, 0, limit, out=self.positions)
+
+    def draw(self, target):
+        if self.atlas.version != self.atlas_version:
+            self._build_sources()
+        sources = self.sources
+        keys = (self.frames.astype(np.int32) * len(self.scales) + self.buckets).tolist()
+        positions = self.positions.astype(np.int32).tolist()
+        target.blits([(sources[key][0], position, sources[key][1]) for key, position in zip(keys, positions)],
+                     doreturn=False)
@@ -0,0 +1,55 @@
+"""
+Static batching for level geometry that never moves.
+
+Add entities to a StaticBatch while building a level, then call build().
+Their models are copied under one node per texture/shader combination and
+flattened together, so the whole group draws as a single mesh however many
+props went into it. Per-entity colors and texture scales are baked into the
+vertices. The original entities stay in the scene, hidden, so their colliders
+keep working exactly as before.
+"""
+
+from ursina import Entity
+
+
+class StaticBatch:
+    def __init__(self, name='static_batch'):
+        self.root = Entity(name=name)
+        self.groups = {}
+        self.sources = []
+
+    @staticmethod
+    def group_key(entity):
+        texture = entity.texture.name if entity.texture else None
+        shader = entity.shader.name if getattr(entity, 'shader', None) else None
+        return texture, shader
+
+    def add(self, entity):
+        """Queue a static entity for batching and return it, so it can wrap Entity(...)."""
+        if not entity.model:
+            return entity   # nothing to draw, e.g. a model that failed to load
+        key = self.group_key(entity)
+        group = self.groups.get(key)
+        if group is None:
+            group = Entity(parent=self.root, name=f'batch {key[0]} {key[1]}', shader=entity.shader)
+            self.groups[key] = group
+        piece = entity.model.copyTo(group)
+        piece.setMat(group, entity.model.getMat(group))
+        # Hide the entity rather than its model: Ursina hands the first loaded
+        # model out as its cache entry, so its node state leaks into later copies.
+        entity.hide()
+        self.sources.append(entity)
+        return entity
+
+    def build(self):
+        """Merge every group into as few meshes as possible. Call once all entities are added."""
+        for group in self.groups.values():
+            # Loaded models are ModelNodes, which flattening would otherwise keep as separate nodes.
+            group.clearModelNodes()
+            group.flattenStrong()
+        return self
+
+    @property
+    def geom_count(self):
+        """Number of Geoms (roughly, draw calls) the batched geometry now takes."""
+        return sum(path.node().getNumGeoms() for path in self.root.findAllMatches('**/+GeomNode'))
@@ -0,0 +1,165 @@
+"""
+Frame-time telemetry: an on-screen overlay and a JSONL capture file.
+
+Telemetry listens to a Profiler, so it gets the same frame / update / render
+split without timing anything twice. Each frame becomes one sample:
+
+    {"frame": 812, "frame_ms": 16.9, "sim_ms": 2.1, "render_ms": 14.3,
+     "entities": 67, "draw_calls": 41, "collision_queries": 12}
+
+Draw calls are counted from Panda3D's last cull result. Building that graph
+costs a few ms, so it is refreshed every draw_call_every frames and repeated
+in between. Counters are callables returning a running total (e.g.
+SpatialHash.queries); the sample gets how much each one went up that frame.
+
+F3 toggles the overlay: the numbers plus a rolling graph of frame times
+against the 60 FPS line. With --telemetry [path] every sample also goes to a
+JSONL file. Writing happens on a background thread, so a slow disk never
+holds up a frame.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+from panda3d.core import NodePath
+from ursina import Entity, Mesh, Text, camera, color, scene
+
+TELEMETRY_FLAG = '--telemetry'
+TELEMETRY_DIR = 'telemetry'
+BUDGET_MS = 1000 / 60
+
+
+def telemetry_path(argv=None):
+    """Where --telemetry asked samples to go, or None if it wasn't given."""
+    argv = sys.argv if argv is None else argv
+    if TELEMETRY_FLAG not in argv:
+        return None
+    index = argv.index(TELEMETRY_FLAG) + 1
+    if index < len(argv) and not argv[index].startswith('--'):
+        return argv[index]
+    return os.path.join(TELEMETRY_DIR, time.strftime('session-%Y%m%d-%H%M%S.jsonl'))
+
+
+def count_draw_calls(app):
+    """Geoms drawn in the last frame, over every active display region."""
+    draws = 0
+    for region in app.win.getActiveDisplayRegions():
+        result = region.makeCullResultGraph()
+        if result is not None:
+            draws += NodePath(result).findAllMatches('**/+GeomNode').getNumPaths()
+    return draws
+
+
+class JsonlWriter:
+    """Appends dicts as JSON lines from a background thread."""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.pending = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.pending.put(record)
+
+    def _run(self):
+        with open(self.path, 'a') as f:
+            while True:
+                record = self.pending.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record) + '\n')
+                if self.pending.empty():
+                    f.flush()
+
+    def close(self):
+        """Write out what is queued and stop the thread."""
+        self.pending.put(None)
+        self.thread.join()
+
+
+class TelemetryOverlay(Entity):
+    def __init__(self, history, **kwargs):
+        # Bottom-left corner of the screen
+        super().__init__(parent=camera.ui, position=(-0.5 * camera.aspect_ratio + 0.02, -0.48), **kwargs)
+        self.width, self.height = 0.4, 0.12
+        self.text = Text('', parent=self, position=(0, self.height + 0.01), origin=(-0.5, -0.5), scale=0.8)
+        Entity(parent=self, model='quad', color=color.black66, origin=(-0.5, -0.5),
+               scale=(self.width, self.height), z=0.01)
+        # The 60 FPS line sits at half height, so the graph tops out at 2x budget
+        Entity(parent=self, model=Mesh(vertices=[(0, self.height / 2, 0), (self.width, self.height / 2, 0)],
+                                       mode='line'), color=color.orange)
+        self.graph = Entity(parent=self, model=Mesh(vertices=[(0, 0, 0)] * history, mode='line', thickness=2),
+                            color=color.lime)
+
+    def show(self, sample, history):
+        self.text.text = (f"frame {sample['frame_ms']:.1f} ms  sim {sample['sim_ms']:.1f}  render {sample['render_ms']:.1f}\n"
+                          + '  '.join(f"{name} {value}" for name, value in sample.items()
+                                      if name not in ('frame', 'frame_ms', 'sim_ms', 'render_ms')))
+        step = self.width / max(len(history) - 1, 1)
+        scale = self.height / (2 * BUDGET_MS)
+        self.graph.model.vertices = [(i * step, min(ms * scale, self.height), 0) for i, ms in enumerate(history)]
+        self.graph.model.generate()
+
+
+class Telemetry:
+    def __init__(self, app, profiler, counters=None, path=None, history=120, draw_call_every=30, hotkey='f3'):
+        self.app = app
+        self.counters = {name: [total, total()] for name, total in (counters or {}).items()}
+        self.history = deque([0.0] * history, maxlen=history)
+        self.draw_call_every = draw_call_every
+        self.draw_calls = 0
+        self.frame = 0
+        self.writer = JsonlWriter(path) if path else None
+        if self.writer:
+            atexit.register(self.close)
+        self.overlay = None
+        self.hotkey = hotkey
+        profiler.listeners.append(self.record)
+        if hotkey:
+            Entity(name='telemetry_hotkey', input=self._input, ignore_paused=True)
+
+    def _input(self, key):
+        if key == self.hotkey:
+            self.toggle_overlay()
+
+    def toggle_overlay(self):
+        if self.overlay is None:
+            self.overlay = TelemetryOverlay(len(self.history))
+        else:
+            self.overlay.enabled = not self.overlay.enabled
+
+    def record(self, frame_seconds, update_seconds, render_seconds):
+        if self.frame % self.draw_call_every == 0 and self.app.win is not None:
+            self.draw_calls = count_draw_calls(self.app)
+        sample = {
+            'frame': self.frame,
+            'frame_ms': round(frame_seconds * 1000, 3),
+            'sim_ms': round(update_seconds * 1000, 3),
+            'render_ms': round(render_seconds * 1000, 3),
+            'entities': len(scene.entities),
+            'draw_calls': self.draw_calls,
+        }
+        for name, counter in self.counters.items():
+            total = counter[0]()
+            sample[name], counter[1] = total - counter[1], total
+        self.frame += 1
+        self.history.append(sample['frame_ms'])
+        if self.writer:
+            self.writer.write(sample)
+        if self.overlay is not None and self.overlay.enabled:
+            self.overlay.show(sample, self.history)
+        return sample
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
@@ -0,0 +1,101 @@
+"""
+Terrain height queries: "how high is the ground under (x, z)?" without a
+collision traversal.
+
+Walkable surfaces are registered once, after the level is built. Each one is
+the top face of a (possibly rotated) box collider, stored as a plane plus the
+face's extents, so its height at any (x, z) is a couple of multiplications.
+The surfaces are rasterized into a uniform XZ grid; every cell keeps the
+surfaces (layers) whose top face overlaps it, so the ground under a floating
+island, a bridge and the island itself can all live in one cell. A query
+looks at one cell and evaluates its few layers, so the cost doesn't grow with
+the size of the level.
+
+ground(x, z, below) returns (height, normal) of the highest surface at or
+under the height below, e.g. a character's feet plus how far it can step up,
+or None if there is nothing under that spot.
+"""
+
+import math
+
+from ursina import Vec3, scene
+from ursina.collider import BoxCollider
+
+INF = float('inf')
+
+
+class Terrain:
+    def __init__(self, cell_size=2.0, max_slope=60):
+        self.cell_size = cell_size
+        self.min_normal_y = math.cos(math.radians(max_slope))
+        self.surfaces = []   # (face center, normal, right axis, half width, forward axis, half depth, entity)
+        self.cells = {}      # (cx, cz) -> tuple of surface indices
+        self.low = self.high = None     # XZ extents of everything added, as (x, z)
+
+    def add(self, entity):
+        """Register the top face of entity's box collider (or model bounds) as walkable.
+
+        Returns False if the face is too steep to stand on.
+        """
+        collider = entity.collider
+        if isinstance(collider, BoxCollider):
+            center, size = Vec3(*collider.center), Vec3(*collider.size)
+        else:
+            bounds = entity.model_bounds
+            center, size = bounds.center, bounds.size
+
+        up = entity.up.normalized()
+        if up.y < self.min_normal_y:
+            return False
+        right, forward = entity.right.normalized(), entity.forward.normalized()
+        top = Vec3(*scene.getRelativePoint(entity, center + Vec3(0, size.y / 2, 0)))
+        scale = entity.world_scale
+        half_u, half_w = abs(scale.x * size.x) / 2, abs(scale.z * size.z) / 2
+
+        index = len(self.surfaces)
+        self.surfaces.append((tuple(top), tuple(up), tuple(right), half_u, tuple(forward), half_w, entity))
+
+        # Conservative XZ footprint of the face, one entry per overlapped cell.
+        reach_x = abs(right.x) * half_u + abs(forward.x) * half_w
+        reach_z = abs(right.z) * half_u + abs(forward.z) * half_w
+        low, high = (top.x - reach_x, top.z - reach_z), (top.x + reach_x, top.z + reach_z)
+        self.low = low if self.low is None else (min(self.low[0], low[0]), min(self.low[1], low[1]))
+        self.high = high if self.high is None else (max(self.high[0], high[0]), max(self.high[1], high[1]))
+        size = self.cell_size
+        for cx in range(math.floor((top.x - reach_x) / size), math.floor((top.x + reach_x) / size) + 1):
+            for cz in range(math.floor((top.z - reach_z) / size), math.floor((top.z + reach_z) / size) + 1):
+                self.cells[(cx, cz)] = self.cells.get((cx, cz), ()) + (index,)
+        return True
+
+    def clear(self):
+        self.surfaces.clear()
+        self.cells.clear()
+        self.low = self.high = None
+
+    def _height_on(self, surface, x, z):
+        """Height of surface's plane at (x, z), or None if (x, z) is off the face."""
+        (px, py, pz), (nx, ny, nz), (ux, uy, uz), half_u, (wx, wy, wz), half_w, _ = surface
+        dx, dz = x - px, z - pz
+        dy = -(nx * dx + nz * dz) / ny
+        if abs(dx * ux + dy * uy + dz * uz) > half_u or abs(dx * wx + dy * wy + dz * wz) > half_w:
+            return None
+        return py + dy
+
+    def ground(self, x, z, below=INF):
+        """(height, normal) of the highest walkable surface under (x, z) not above below, or None."""
+        indices = self.cells.get((math.floor(x / self.cell_size), math.floor(z / self.cell_size)))
+        if not indices:
+            return None
+        best, best_surface = -INF, None
+        for index in indices:
+            surface = self.surfaces[index]
+            height = self._height_on(surface, x, z)
+            if height is not None and best < height <= below:
+                best, best_surface = height, surface
+        if best_surface is None:
+            return None
+        return best, Vec3(*best_surface[1])
+
+    def height(self, x, z, below=INF, default=None):
+        hit = self.ground(x, z, below)
+        return default if hit is None else hit[0]
@@ -2,6 +2,9 @@ from ursina import *
 from ursina.shaders import lit_with_shadows_shader
 from random import randint
 import math
+from collisionproxy import use_proxy_collider
+from fixedstep import FixedStepBody
+from terrain import Terrain
 
 app = Ursina()
 
@@ -10,6 +13,17 @@ window.color = color.light_gray
 ground = Entity(model='plane', scale=(50,1,50), texture='grass', 
                texture_scale=(10,10), collider='box')
 
+# Ground height lookups for everything that walks or rolls, filled in once the level exists
+terrain = Terrain()
+STEP_HEIGHT = 0.5   # how high a ledge the player walks up without jumping
+
+def rest_on_terrain(entity):
+    """Drop or lift a sphere-shaped entity so it sits on the surface under it, if any."""
+    radius = entity.scale_y / 2
+    floor = terrain.height(entity.x, entity.z, below=entity.y - radius + STEP_HEIGHT)
+    if floor is not None:
+        entity.y = floor + radius
+
 # Improved Player class
 class Player(Entity):
     def __init__(self):
@@ -23,18 +37,30 @@ class Player(Entity):
         )
         self.speed = 8
         self.jump_height = 6
-        self.gravity = 1.5
+        self.gravity = 90   # units/s², what the old per-frame 1.5 * 60 came to at 60 FPS
         self.velocity = Vec3(0,0,0)
         self.camera_pivot = Entity(parent=self, y=2)
         self.grounded = False
         self.invincible = False
         self.invincible_timer = 0
+        # Movement runs at a fixed rate, drawn interpolated between steps
+        self.physics = FixedStepBody(self, self.physics_step)
         
         camera.parent = self.camera_pivot
         camera.position = (0, 1, -8)
         camera.rotation = (15, 0, 0)
 
     def update(self):
+        self.physics.update(time.dt)
+
+        # Camera controls with sensitivity adjustment
+        self.camera_pivot.rotation_y += mouse.velocity[0] * 30
+        self.camera_pivot.rotation_x = clamp(
+            self.camera_pivot.rotation_x - mouse.velocity[1] * 30,
+            -60, 60
+        )
+
+    def physics_step(self, dt):
         # Smoother movement with diagonal normalization
         movement = self.camera_pivot.forward * (held_keys['w'] - held_keys['s']) + \
                   self.camera_pivot.right * (held_keys['d'] - held_keys['a'])
@@ -45,30 +71,27 @@ class Player(Entity):
         self.velocity.z = movement.z * self.speed
         
         # Improved gravity system
-        self.velocity.y -= self.gravity * time.dt * 60
+        self.velocity.y -= self.gravity * dt
+        self.position += self.velocity * dt
         
-        self.grounded = self.intersects(ground).hit
-        if self.grounded and self.velocity.y < 0:
+        # Stand on the highest surface under our feet, stepping up small ledges
+        feet = self.y - self.scale_y / 2
+        floor = terrain.height(self.x, self.z, below=feet + STEP_HEIGHT)
+        self.grounded = floor is not None and self.velocity.y <= 0 and feet <= floor
+        if self.grounded:
+            self.y = floor + self.scale_y / 2
             self.velocity.y = 0
-            
-        self.position += self.velocity * time.dt
         
         # Reset position with invincibility
         if self.y < -10:
             self.position = (0,10,0)
             self.invincible = True
             self.invincible_timer = 2
-            
-        # Camera controls with sensitivity adjustment
-        self.camera_pivot.rotation_y += mouse.velocity[0] * 30
-        self.camera_pivot.rotation_x = clamp(
-            self.camera_pivot.rotation_x - mouse.velocity[1] * 30,
-            -60, 60
-        )
+            self.physics.snap()
         
         # Invincibility timer
         if self.invincible:
-            self.invincible_timer -= time.dt
+            self.invincible_timer -= dt
             if self.invincible_timer <= 0:
                 self.invincible = False
 
@@ -84,9 +107,9 @@ class MountainTerrain(Entity):
             scale=(30,10,30),
             position=(0,5,30),
             rotation=(0,0,15),
-            texture='rock',
-            collider='mesh'
+            texture='rock'
         )
+        use_proxy_collider(self)
 
 class Bobomb(Entity):
     def __init__(self, position):
@@ -103,6 +126,7 @@ class Bobomb(Entity):
         self.rotation_y += 70 * time.dt
         if distance(self, player) < 5 and not player.invincible:
             self.position += (player.position - self.position).normalized() * self.speed * time.dt
+            rest_on_terrain(self)
 
 class ChainChomp(Entity):
     def __init__(self):
@@ -141,9 +165,10 @@ class RollingBoulder(Entity):
     def update(self):
         target = self.path[0] if self.direction == -1 else self.path[1]
         self.position = lerp(self.position, target, time.dt * self.speed/10)
+        rest_on_terrain(self)
         self.rotation_y += 150 * time.dt
         
-        if distance(self, target) < 1:
+        if distance_xz(self, target) < 1:
             self.direction *= -1
 
 # Level Construction
@@ -175,9 +200,12 @@ power_star = Entity(
     color=color.yellow,
     scale=0.5,
     position=floating_island.position + Vec3(0,2,0),
-    collider='mesh',
     eternal=True
 )
+use_proxy_collider(power_star)
+
+for surface in (ground, mountain, bridge, floating_island):
+    terrain.add(surface)
 
 # Game Systems
 score = 0
@@ -0,0 +1,112 @@
+"""
+Update tiers: entities far from the camera update less often.
+
+Entities handed to UpdateTiers are ticked by it instead of by Ursina's loop.
+Every frame each one is put in a tier by its distance to the camera:
+
+    near  within near units: tick(dt) every frame
+    mid   within far units: tick every `every` frames, with the dt of the
+          frames it skipped, so it moves as far as it would have
+    far   frozen, no ticks and no time piles up
+
+Something outside the camera's view drops one tier (near -> mid, mid -> far),
+since nobody can see it stutter. Mid-tier entities are spread over the
+`every` frames so they don't all tick on the same one.
+
+Distances, the `every` rate and the model used in each tier are set per
+prefab (a name, the same as for EntityPools):
+
+    tiers.register('chain_chomp', near=25, far=60, every=3,
+                   models={'near': 'sphere', 'mid': 'icosphere', 'far': 'icosphere'})
+    tiers.add(chomp, 'chain_chomp')
+
+counts holds how many entities were in each tier on the last frame.
+"""
+
+from panda3d.core import BoundingSphere, NodePath
+from ursina import application, camera, load_model
+
+NEAR, MID, FAR = 'near', 'mid', 'far'
+TIERS = (NEAR, MID, FAR)
+
+
+class UpdateTiers:
+    def __init__(self, near=20, far=60, every=4):
+        self.defaults = {'near': near, 'far': far, 'every': every, 'models': None}
+        self.prefabs = {}
+        self.entities = {}      # entity -> [prefab settings, tier, phase, banked dt, {model name: model}]
+        self.counts = dict.fromkeys(TIERS, 0)
+        self.frame = 0
+
+    def register(self, prefab, near=None, far=None, every=None, models=None):
+        """Set distances, mid-tier rate and per-tier models ({tier: model}) for a prefab."""
+        given = {'near': near, 'far': far, 'every': every, 'models': models}
+        self.prefabs[prefab] = {key: self.defaults[key] if value is None else value for key, value in given.items()}
+
+    def add(self, entity, prefab):
+        """Tier entity from now on; it needs a tick(dt) method. Returns entity."""
+        if prefab not in self.prefabs:
+            self.register(prefab)
+        entity.ignore = True    # we tick it, Ursina's loop shouldn't
+        self.entities[entity] = [self.prefabs[prefab], None, len(self.entities), 0.0, {}]
+        return entity
+
+    def remove(self, entity):
+        if self.entities.pop(entity, None) is not None:
+            entity.ignore = False
+
+    def clear(self):
+        for entity in list(self.entities):
+            self.remove(entity)
+
+    def tier_of(self, entity, settings, cam, frustum):
+        point = cam.getRelativePoint(entity, (0, 0, 0))
+        distance = point.length()
+        tier = 0 if distance <= settings['near'] else 1 if distance <= settings['far'] else 2
+        # A sphere as big as the entity's largest scale, so something half on screen counts as seen
+        if tier < 2 and frustum is not None and not frustum.contains(BoundingSphere(point, max(entity.getScale(cam)))):
+            tier += 1
+        return TIERS[tier]
+
+    def switch_model(self, entity, name, lods):
+        """Swap entity's model for its own copy of model name, keeping the old one for later."""
+        if entity.model.name == name:
+            return
+        lods.setdefault(entity.model.name, entity.model)
+        model = lods.get(name)
+        if model is None:
+            # Copy rather than take Ursina's cached model: Entity.model = 'name' removes the
+            # previous model node, and the first one loaded is the cache entry itself.
+            loaded = load_model(name) or load_model(name, application.internal_models_compressed_folder)
+            model = lods[name] = loaded.copyTo(NodePath(name))
+            model.name = name
+        entity.model = model    # a NodePath is only detached when replaced, so it can come back
+
+    def update(self, dt):
+        self.frame += 1
+        counts = dict.fromkeys(TIERS, 0)
+        # No window (--headless) means no lens: tier by distance only
+        cam = application.base.cam or camera
+        lens = application.base.camLens
+        frustum = lens.makeBounds() if lens is not None else None
+        for entity, state in list(self.entities.items()):
+            if not entity.enabled:
+                continue
+            settings = state[0]
+            tier = self.tier_of(entity, settings, cam, frustum)
+            counts[tier] += 1
+            if tier != state[1]:
+                state[1] = tier
+                models = settings['models']
+                if models and models.get(tier) and entity.model:
+                    self.switch_model(entity, models[tier], state[4])
+
+            if tier == FAR:
+                state[3] = 0.0
+                continue
+            state[3] += dt
+            if tier == NEAR or (self.frame + state[2]) % settings['every'] == 0:
+                banked, state[3] = state[3], 0.0
+                entity.tick(banked)
+        self.counts = counts
+        return counts